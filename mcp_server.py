@@ -7,14 +7,17 @@ permitindo que modelos de linguagem busquem produtos e gerem links.
 """
 
 import asyncio
+import operator
 import os
-from typing import Any
+import time
+from typing import Any, Optional
 
+import orjson
 from mcp.server import Server
 from mcp.server.stdio import stdio_server
 from mcp.types import Tool, TextContent
 
-from scripts.shopee_api import ShopeeAPI, ShopeeAPIError, get_tipo_loja
+from scripts.shopee_api import LinkBatcher, ShopeeAPI, ShopeeAPIError, get_tipo_loja
 
 # Criar servidor MCP
 app = Server("shopee-api-server")
@@ -23,6 +26,79 @@ app = Server("shopee-api-server")
 SHOPEE_APP_ID = os.getenv("SHOPEE_APP_ID")
 SHOPEE_APP_SECRET = os.getenv("SHOPEE_APP_SECRET")
 
+# Cliente compartilhado entre chamadas (mantém o pool de conexões aberto)
+_api: Optional[ShopeeAPI] = None
+_link_batcher: Optional[LinkBatcher] = None
+
+# Chamadas simultâneas por ferramenta; acima disso aguardam até _FILA_TIMEOUT
+_TOOL_SEMAPHORES = {
+    "buscar_produtos": asyncio.Semaphore(8),
+    "buscar_produtos_loja": asyncio.Semaphore(8),
+    "gerar_link_afiliado": asyncio.Semaphore(16),
+}
+_FILA_TIMEOUT = 30
+
+# Máximo de produtos exibidos por resposta; buscas maiores são limitadas na API
+_MAX_EXIBIDOS = 20
+
+# Log opcional das chamadas em JSONL, escrito em background
+_LOG_PATH = os.getenv("SHOPEE_MCP_LOG")
+_log_queue: Optional[asyncio.Queue] = None
+_log_writer: Optional[asyncio.Task] = None
+
+
+def _get_api() -> ShopeeAPI:
+    """Retorna o cliente compartilhado, criando-o na primeira chamada."""
+    global _api
+    if _api is None:
+        _api = ShopeeAPI()
+    return _api
+
+
+def _get_link_batcher() -> LinkBatcher:
+    """Retorna o agrupador de links compartilhado, criando-o na primeira chamada."""
+    global _link_batcher
+    if _link_batcher is None:
+        _link_batcher = LinkBatcher(_get_api())
+    return _link_batcher
+
+
+def _log_tool_call(name: str, status: str, inicio: float) -> None:
+    """Enfileira o registro de uma chamada para o writer em background."""
+    global _log_queue, _log_writer
+    if not _LOG_PATH:
+        return
+    if _log_writer is None:
+        _log_queue = asyncio.Queue()
+        _log_writer = asyncio.create_task(_write_log())
+    _log_queue.put_nowait({
+        "ts": time.time(),
+        "tool": name,
+        "status": status,
+        "duration_ms": round((time.perf_counter() - inicio) * 1000, 1),
+    })
+
+
+def _append_log(lines: bytes) -> None:
+    """Acrescenta linhas JSONL já serializadas ao arquivo de log."""
+    with open(_LOG_PATH, "ab") as f:
+        f.write(lines)
+
+
+async def _write_log() -> None:
+    """Consome a fila de log, gravando em lote o que estiver pendente."""
+    while True:
+        entries = [await _log_queue.get()]
+        while not _log_queue.empty():
+            entries.append(_log_queue.get_nowait())
+        lines = b"".join(orjson.dumps(e, option=orjson.OPT_APPEND_NEWLINE) for e in entries)
+        try:
+            await asyncio.to_thread(_append_log, lines)
+        except OSError:
+            pass  # Falha no log não pode derrubar o servidor
+        for _ in entries:
+            _log_queue.task_done()
+
 
 @app.list_tools()
 async def list_tools() -> list[Tool]:
@@ -40,7 +116,7 @@ async def list_tools() -> list[Tool]:
                     },
                     "limit": {
                         "type": "integer",
-                        "description": "Número de resultados (1-500)",
+                        "description": "Número de resultados (1-500; no máximo 20 são retornados)",
                         "default": 10,
                         "minimum": 1,
                         "maximum": 500,
@@ -61,7 +137,7 @@ async def list_tools() -> list[Tool]:
                     },
                     "limit": {
                         "type": "integer",
-                        "description": "Número de resultados (1-500)",
+                        "description": "Número de resultados (1-500; no máximo 20 são retornados)",
                         "default": 10,
                         "minimum": 1,
                         "maximum": 500,
@@ -95,127 +171,236 @@ async def list_tools() -> list[Tool]:
     ]
 
 
-@app.call_tool()
-async def call_tool(name: str, arguments: dict[str, Any]) -> list[TextContent]:
-    """Executa uma ferramenta."""
+# Campos exibidos, lidos de uma vez por produto (nodes trazem todos os campos da query)
+_PRODUCT_FIELDS = operator.itemgetter(
+    "productName", "price", "commissionRate", "shopName", "shopType", "offerLink"
+)
 
-    # Verificar credenciais antes de qualquer operação
-    if not SHOPEE_APP_ID or not SHOPEE_APP_SECRET:
-        if name == "verificar_credenciais":
-            return [TextContent(
-                type="text",
-                text="❌ Credenciais não configuradas. Defina SHOPEE_APP_ID e SHOPEE_APP_SECRET."
-            )]
-        return [TextContent(
-            type="text",
-            text="Erro: Credenciais da API não configuradas. Use SHOPEE_APP_ID e SHOPEE_APP_SECRET."
-        )]
 
-    api = None
+def _campos_produto(p: dict[str, Any]) -> tuple:
+    """Extrai os campos exibidos, com os padrões de .get() se faltar algum."""
     try:
-        api = ShopeeAPI()
+        return _PRODUCT_FIELDS(p)
+    except KeyError:
+        return (
+            p.get("productName", "N/A"),
+            p.get("price", "N/A"),
+            p.get("commissionRate"),
+            p.get("shopName", "N/A"),
+            p.get("shopType"),
+            p.get("offerLink", "N/A"),
+        )
 
-        if name == "buscar_produtos":
-            keyword = arguments.get("keyword", "")
-            limit = arguments.get("limit", 10)
 
-            produtos = await asyncio.to_thread(api.buscar_produtos, keyword=keyword, limit=limit)
+def _comissao_percentual(rate: Any) -> float:
+    """Converte um commissionRate ("0.05") em percentual; inválido vira 0."""
+    try:
+        return float(rate or 0) * 100
+    except (ValueError, TypeError):
+        return 0.0
 
-            if not produtos:
-                return [TextContent(type="text", text=f"Nenhum produto encontrado para '{keyword}'")]
 
-            resultado = f"📦 {len(produtos)} produtos encontrados para '{keyword}':\n\n"
-            for p in produtos[:20]:  # Limitar a 20 para não sobrecarregar
-                nome = p.get("productName", "N/A")
-                preco = p.get("price", "N/A")
+def _comissoes_percentuais(rates: list[Any]) -> list[float]:
+    """Converte todos os commissionRate de uma vez (caminho rápido sem try por item)."""
+    try:
+        return [float(rate or 0) * 100 for rate in rates]
+    except (ValueError, TypeError):
+        return [_comissao_percentual(rate) for rate in rates]
+
+
+def _format_produtos(produtos: list[dict[str, Any]], keyword: str) -> str:
+    """Monta o texto de resposta de buscar_produtos."""
+    parts = [f"📦 {len(produtos)} produtos encontrados para '{keyword}':\n\n"]
+    campos = [_campos_produto(p) for p in produtos]
+    comissoes = _comissoes_percentuais([c[2] for c in campos])
+
+    for (nome, preco, _, loja, shop_type, link), comissao in zip(campos, comissoes):
+        tipo = get_tipo_loja(shop_type or [])
+
+        tipo_str = f" ({tipo})" if tipo else ""
+        parts.append(
+            f"• {nome}\n"
+            f"  💰 Preço: R$ {preco}\n"
+            f"  💵 Comissão: {comissao:.1f}%\n"
+            f"  🏪 {loja}{tipo_str}\n"
+            f"  🔗 {link}\n\n"
+        )
 
-                # Tratar conversão segura de commissionRate
-                try:
-                    rate = p.get("commissionRate")
-                    if rate is None:
-                        rate = "0"
-                    comissao = float(rate) * 100
-                except (ValueError, TypeError):
-                    comissao = 0.0
-                loja = p.get("shopName", "N/A")
-                tipo = get_tipo_loja(p.get("shopType") or [])
-                link = p.get("offerLink", "N/A")
+    return "".join(parts)
 
-                resultado += f"• {nome}\n"
-                resultado += f"  💰 Preço: R$ {preco}\n"
-                resultado += f"  💵 Comissão: {comissao:.1f}%\n"
-                resultado += f"  🏪 {loja}"
-                if tipo:
-                    resultado += f" ({tipo})"
-                resultado += f"\n  🔗 {link}\n\n"
 
-            if len(produtos) > 20:
-                resultado += f"... e mais {len(produtos) - 20} produtos"
+def _format_produtos_loja(produtos: list[dict[str, Any]], shop_id: Any) -> str:
+    """Monta o texto de resposta de buscar_produtos_loja."""
+    parts = [f"📦 {len(produtos)} produtos da loja {shop_id}:\n\n"]
+    for p in produtos:
+        nome = p.get("productName", "N/A")
+        preco = p.get("price", "N/A")
+        link = p.get("offerLink", "N/A")
 
-            return [TextContent(type="text", text=resultado)]
+        parts.append(f"• {nome}\n  💰 Preço: R$ {preco}\n  🔗 {link}\n\n")
 
-        elif name == "buscar_produtos_loja":
-            shop_id = arguments.get("shop_id")
-            limit = arguments.get("limit", 10)
+    return "".join(parts)
 
-            produtos = await asyncio.to_thread(api.buscar_produtos, shop_id=shop_id, limit=limit)
 
-            if not produtos:
-                return [TextContent(type="text", text=f"Nenhum produto encontrado para loja {shop_id}")]
+def _validar_limit(value: Any) -> int:
+    """Converte o argumento limit em inteiro de 1 a 500 (ausente/None vira 10)."""
+    if value is None:
+        return 10
+    if isinstance(value, bool):
+        raise ValueError("limit deve ser um número inteiro entre 1 e 500")
+    try:
+        limit = int(value)
+    except (ValueError, TypeError):
+        raise ValueError("limit deve ser um número inteiro entre 1 e 500") from None
+    if limit != value and not isinstance(value, str):
+        raise ValueError("limit deve ser um número inteiro entre 1 e 500")  # ex.: 2.5
+    if not 1 <= limit <= 500:
+        raise ValueError("limit deve estar entre 1 e 500")
+    return limit
 
-            resultado = f"📦 {len(produtos)} produtos da loja {shop_id}:\n\n"
-            for p in produtos[:20]:
-                nome = p.get("productName", "N/A")
-                preco = p.get("price", "N/A")
-                link = p.get("offerLink", "N/A")
 
-                resultado += f"• {nome}\n"
-                resultado += f"  💰 Preço: R$ {preco}\n"
-                resultado += f"  🔗 {link}\n\n"
+def _aviso_limite(limit: int) -> str:
+    """Nota anexada à resposta quando o limit pedido passa do exibido."""
+    if limit > _MAX_EXIBIDOS:
+        return f"ℹ️ Exibindo no máximo {_MAX_EXIBIDOS} produtos por resposta (pedido: {limit}).\n"
+    return ""
 
-            if len(produtos) > 20:
-                resultado += f"... e mais {len(produtos) - 20} produtos"
 
-            return [TextContent(type="text", text=resultado)]
+async def _handle_buscar_produtos(
+    api: ShopeeAPI, arguments: dict[str, Any]
+) -> list[TextContent]:
+    """Busca produtos por palavra-chave."""
+    keyword = arguments.get("keyword", "")
+    limit = _validar_limit(arguments.get("limit", 10))
 
-        elif name == "gerar_link_afiliado":
-            url = arguments.get("url", "")
+    # Só são exibidos _MAX_EXIBIDOS produtos: não adianta trazer mais da API
+    produtos = await api.buscar_produtos(
+        keyword=keyword, limit=min(limit, _MAX_EXIBIDOS)
+    )
 
-            link_curto = await asyncio.to_thread(api.gerar_link_curto, url)
+    if not produtos:
+        return [TextContent(type="text", text=f"Nenhum produto encontrado para '{keyword}'")]
 
-            return [TextContent(
-                type="text",
-                text=f"🔗 Link de afiliado gerado:\n{link_curto}"
-            )]
+    resultado = _format_produtos(produtos, keyword)
+    return [TextContent(type="text", text=resultado + _aviso_limite(limit))]
+
+
+async def _handle_buscar_produtos_loja(
+    api: ShopeeAPI, arguments: dict[str, Any]
+) -> list[TextContent]:
+    """Busca produtos de uma loja específica."""
+    shop_id = arguments.get("shop_id")
+    limit = _validar_limit(arguments.get("limit", 10))
+
+    produtos = await api.buscar_produtos(
+        shop_id=shop_id, limit=min(limit, _MAX_EXIBIDOS)
+    )
+
+    if not produtos:
+        return [TextContent(type="text", text=f"Nenhum produto encontrado para loja {shop_id}")]
+
+    resultado = _format_produtos_loja(produtos, shop_id)
+    return [TextContent(type="text", text=resultado + _aviso_limite(limit))]
 
-        elif name == "verificar_credenciais":
+
+async def _handle_gerar_link(
+    api: ShopeeAPI, arguments: dict[str, Any]
+) -> list[TextContent]:
+    """Gera link curto de afiliado."""
+    url = arguments.get("url", "")
+
+    # Chamadas concorrentes são agrupadas em uma única mutation
+    link_curto = await _get_link_batcher().submit(url)
+
+    return [TextContent(
+        type="text",
+        text=f"🔗 Link de afiliado gerado:\n{link_curto}"
+    )]
+
+
+async def _handle_verificar(
+    api: ShopeeAPI, arguments: dict[str, Any]
+) -> list[TextContent]:
+    """Confirma que as credenciais estão configuradas."""
+    return [TextContent(
+        type="text",
+        text="✅ Credenciais configuradas corretamente.\nAPP_ID: ****\nAPP_SECRET: ****"
+    )]
+
+
+_HANDLERS = {
+    "buscar_produtos": _handle_buscar_produtos,
+    "buscar_produtos_loja": _handle_buscar_produtos_loja,
+    "gerar_link_afiliado": _handle_gerar_link,
+    "verificar_credenciais": _handle_verificar,
+}
+
+
+@app.call_tool()
+async def call_tool(name: str, arguments: dict[str, Any]) -> list[TextContent]:
+    """Executa uma ferramenta."""
+
+    # Verificar credenciais antes de qualquer operação
+    if not SHOPEE_APP_ID or not SHOPEE_APP_SECRET:
+        if name == "verificar_credenciais":
             return [TextContent(
                 type="text",
-                text="✅ Credenciais configuradas corretamente.\nAPP_ID: ****\nAPP_SECRET: ****"
+                text="❌ Credenciais não configuradas. Defina SHOPEE_APP_ID e SHOPEE_APP_SECRET."
             )]
+        return [TextContent(
+            type="text",
+            text="Erro: Credenciais da API não configuradas. Use SHOPEE_APP_ID e SHOPEE_APP_SECRET."
+        )]
 
-        else:
-            return [TextContent(type="text", text=f"Ferramenta desconhecida: {name}")]
+    handler = _HANDLERS.get(name)
+    if handler is None:
+        return [TextContent(type="text", text=f"Ferramenta desconhecida: {name}")]
 
+    inicio = time.perf_counter()
+    status = "ok"
+
+    sem = _TOOL_SEMAPHORES.get(name)
+    if sem is not None:
+        try:
+            await asyncio.wait_for(sem.acquire(), timeout=_FILA_TIMEOUT)
+        except asyncio.TimeoutError:
+            _log_tool_call(name, "fila_cheia", inicio)
+            return [TextContent(type="text", text="⏳ Fila cheia, tente novamente em instantes.")]
+
+    try:
+        return await handler(_get_api(), arguments)
     except ShopeeAPIError as e:
+        status = "erro_api"
         return [TextContent(type="text", text=f"Erro da API Shopee: {e}")]
     except ValueError as e:
+        status = "erro_validacao"
         return [TextContent(type="text", text=f"Erro de validação: {e}")]
     except Exception as e:
+        status = "erro"
         return [TextContent(type="text", text=f"Erro inesperado: {e}")]
     finally:
-        if api is not None:
-            api.close()
+        if sem is not None:
+            sem.release()
+        _log_tool_call(name, status, inicio)
 
 
 async def main():
     """Função principal do servidor MCP."""
-    async with stdio_server() as (read_stream, write_stream):
-        await app.run(
-            read_stream,
-            write_stream,
-            app.create_initialization_options(),
-        )
+    try:
+        async with stdio_server() as (read_stream, write_stream):
+            await app.run(
+                read_stream,
+                write_stream,
+                app.create_initialization_options(),
+            )
+    finally:
+        if _log_writer is not None:
+            await _log_queue.join()
+            _log_writer.cancel()
+        if _link_batcher is not None:
+            await _link_batcher.aclose()
+        if _api is not None:
+            await _api.aclose()
 
 
 if __name__ == "__main__":
@@ -4,15 +4,19 @@ Cliente API Shopee Affiliate
 Exemplo de uso da API de Afiliados da Shopee Brasil
 """
 
+import argparse
+import asyncio
+import functools
 import hashlib
-import json
+import importlib.util
 import os
 import sys
 import time
-import argparse
-from typing import Any, Dict, List, Optional
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Final, List, Optional, Sequence, Tuple, Union
 
-import requests
+import httpx
+import orjson
 from dotenv import load_dotenv
 
 # Carregar variáveis de ambiente do arquivo .env
@@ -23,11 +27,175 @@ _APP_ID = os.getenv("SHOPEE_APP_ID")
 _APP_SECRET = os.getenv("SHOPEE_APP_SECRET")
 _ENDPOINT = "https://open-api.affiliate.shopee.com.br/graphql"
 
+# Tentativas de reconexão em falhas de conexão (não repete requisições enviadas)
+_MAX_RETRIES = int(os.getenv("SHOPEE_MAX_RETRIES", "3"))
+
+# Respostas GraphQL com centenas de produtos comprimem bem; brotli só se instalado
+_ACCEPT_ENCODING = (
+    "gzip, br"
+    if importlib.util.find_spec("brotli") or importlib.util.find_spec("brotlicffi")
+    else "gzip"
+)
+
+# Cache de buscas de produtos (segundos; 0 desativa)
+_CACHE_TTL = float(os.getenv("SHOPEE_CACHE_TTL", "60"))
+_PRODUTOS_CACHE_MAX = 512
+_LINKS_CACHE_MAX = 2048
+
+# productOfferV2 aceita até 500 itens por página; acima disso, buscar_produtos pagina
+_PAGE_LIMIT = 500
+_MAX_PRODUTOS = 2000
+
+# Códigos de erro que dizem respeito a um item (11000 processamento, 11001
+# parâmetro inválido); os demais (autenticação 10020, limite de requisições
+# 10030, acesso 10031-10035...) valem para qualquer requisição da conta
+_ITEM_ERROR_CODES = frozenset({"11000", "11001"})
+
+# Bits de shopType usados por get_tipo_loja (1=Mall, 2=Star, 4=Star+)
+_SHOP_TYPE_MALL = 1 << 1
+_SHOP_TYPE_STAR = 1 << 2
+_SHOP_TYPE_STAR_PLUS = 1 << 4
+# shopType conhecido -> bit; valores fora daqui (negativos, enormes, não inteiros) são ignorados
+_SHOP_TYPE_BITS = {1: _SHOP_TYPE_MALL, 2: _SHOP_TYPE_STAR, 4: _SHOP_TYPE_STAR_PLUS}
+
+_PRODUCT_NODE_FIELDS: Final[str] = """
+            nodes {
+                itemId
+                productName
+                price
+                priceMin
+                priceMax
+                commissionRate
+                commission
+                sales
+                ratingStar
+                priceDiscountRate
+                imageUrl
+                productLink
+                offerLink
+                shopId
+                shopName
+                shopType
+            }
+            pageInfo {
+                page
+                limit
+                hasNextPage
+            }"""
+
+
+def _build_product_query(with_shop: bool, with_cat: bool) -> str:
+    """Monta a query productOfferV2 declarando apenas os filtros usados."""
+    query_vars = ["$keyword: String", "$limit: Int!", "$sortType: Int!", "$page: Int"]
+    query_params = [
+        "keyword: $keyword",
+        "limit: $limit",
+        "sortType: $sortType",
+        "page: $page",
+    ]
+    if with_shop:
+        query_vars.append("$shopId: Int64")
+        query_params.append("shopId: $shopId")
+    if with_cat:
+        query_vars.append("$productCatId: Int32")
+        query_params.append("productCatId: $productCatId")
+
+    return """
+    query ProductOfferV2(
+        {vars}
+    ) {{
+        productOfferV2(
+            {params}
+        ) {{{fields}
+        }}
+    }}
+    """.format(
+        vars="\n        ".join(query_vars),
+        params="\n            ".join(query_params),
+        fields=_PRODUCT_NODE_FIELDS,
+    )
+
+
+# Queries pré-montadas por (filtra por loja?, filtra por categoria?)
+_PRODUCT_QUERIES: Final[Dict[Tuple[bool, bool], str]] = {
+    (with_shop, with_cat): _build_product_query(with_shop, with_cat)
+    for with_shop in (False, True)
+    for with_cat in (False, True)
+}
+
+_SHOP_OFFER_QUERY: Final[str] = """
+query ShopOfferV2(
+    $keyword: String
+    $limit: Int!
+    $shopType: [Int]
+    $sortType: Int!
+) {
+    shopOfferV2(
+        keyword: $keyword
+        limit: $limit
+        shopType: $shopType
+        sortType: $sortType
+    ) {
+        nodes {
+            shopId
+            shopName
+            commissionRate
+            offerLink
+            ratingStar
+            remainingBudget
+        }
+        pageInfo {
+            page
+            hasNextPage
+        }
+    }
+}
+"""
+
+_SHORT_LINK_MUTATION: Final[str] = """
+mutation GenerateShortLink($input: GenerateShortLinkInput!) {
+    generateShortLink(input: $input) {
+        shortLink
+    }
+}
+"""
+
+
+@functools.lru_cache(maxsize=None)
+def _batch_link_mutation(n: int) -> str:
+    """Monta a mutation com n generateShortLink apelidados (l0..ln-1)."""
+    inputs = ", ".join(f"$i{i}: GenerateShortLinkInput!" for i in range(n))
+    fields = "\n".join(
+        f"    l{i}: generateShortLink(input: $i{i}) {{ shortLink }}" for i in range(n)
+    )
+    return f"mutation GenerateShortLinks({inputs}) {{\n{fields}\n}}"
+
+
+def _validar_link(origin_url: str, sub_ids: Optional[List[str]]) -> None:
+    """Valida os argumentos de geração de link curto."""
+    # Validar URL
+    if not origin_url or not isinstance(origin_url, str):
+        raise ValueError("origin_url deve ser uma string não-vazia")
+    if not origin_url.startswith(("http://", "https://")):
+        raise ValueError("origin_url deve começar com http:// ou https://")
+
+    # Validar sub_ids
+    if sub_ids is not None:
+        if not isinstance(sub_ids, list):
+            raise ValueError("sub_ids deve ser uma lista")
+        if len(sub_ids) > 5:
+            raise ValueError("sub_ids pode ter no máximo 5 itens")
+
 
 class ShopeeAPIError(Exception):
     """Erro da API Shopee"""
 
-    pass
+    def __init__(self, message: str = "", code: Any = None, por_item: Optional[bool] = None):
+        super().__init__(message)
+        # extensions.code da resposta GraphQL, quando houver
+        self.code = code
+        # Erro restrito a um item (ex.: URL inválida), e não à conta/requisição
+        self.por_item = str(code) in _ITEM_ERROR_CODES if por_item is None else por_item
 
 
 class ShopeeAPI:
@@ -42,25 +210,73 @@ class ShopeeAPI:
             )
         self.app_id = app_id
         self.app_secret = app_secret
+        # app_id abre toda entrada da assinatura: absorvido uma única vez
+        self._sig_prefix = hashlib.sha256(app_id.encode())
+        self._app_secret_bytes = app_secret.encode()
+        # Partes fixas dos headers; por requisição só entram timestamp e assinatura
+        self._auth_prefix = f"SHA256 Credential={app_id}, Timestamp=".encode()
+        self._base_headers = {
+            "Content-Type": "application/json",
+            "Accept-Encoding": _ACCEPT_ENCODING,
+        }
         self.endpoint = _ENDPOINT
-        self.session = requests.Session()
         self.timeout = 30
-
-    def _calculate_signature(self, timestamp: int, payload: str) -> str:
+        self.client = httpx.AsyncClient(
+            timeout=self.timeout,
+            transport=httpx.AsyncHTTPTransport(
+                http2=True,
+                retries=_MAX_RETRIES,
+                limits=httpx.Limits(max_keepalive_connections=20, max_connections=50),
+            ),
+        )
+        self.cache_ttl = _CACHE_TTL
+        self._produtos_cache: Dict[Tuple, Tuple[float, List[Dict[str, Any]]]] = {}
+        self._links_cache: "OrderedDict[Tuple, str]" = OrderedDict()
+
+    def _produtos_cache_get(self, key: Tuple) -> Optional[List[Dict[str, Any]]]:
+        """Retorna uma cópia da busca em cache, se ainda estiver válida."""
+        entry = self._produtos_cache.get(key)
+        if entry is None:
+            return None
+        expires_at, produtos = entry
+        if time.monotonic() >= expires_at:
+            del self._produtos_cache[key]
+            return None
+        return list(produtos)
+
+    def _produtos_cache_set(self, key: Tuple, produtos: List[Dict[str, Any]]) -> None:
+        """Armazena uma busca, descartando entradas expiradas ou antigas se cheio."""
+        now = time.monotonic()
+        if len(self._produtos_cache) >= _PRODUTOS_CACHE_MAX:
+            expired = [k for k, (exp, _) in self._produtos_cache.items() if exp <= now]
+            for k in expired:
+                del self._produtos_cache[k]
+            if len(self._produtos_cache) >= _PRODUTOS_CACHE_MAX:
+                del self._produtos_cache[next(iter(self._produtos_cache))]
+        self._produtos_cache[key] = (now + self.cache_ttl, list(produtos))
+
+    def _calculate_signature(self, timestamp: Union[int, bytes], payload: bytes) -> str:
         """
         Calcula a assinatura SHA256 para autenticação.
 
         Args:
-            timestamp: Unix timestamp atual
-            payload: Corpo da requisição JSON como string
+            timestamp: Unix timestamp atual (int ou já codificado em bytes)
+            payload: Corpo da requisição JSON já serializado
 
         Returns:
             Assinatura SHA256 em hexadecimal
         """
-        signature_input = f"{self.app_id}{timestamp}{payload}{self.app_secret}"
-        return hashlib.sha256(signature_input.encode()).hexdigest()
-
-    def request(self, query: str, variables: Optional[Dict] = None) -> Dict[str, Any]:
+        if isinstance(timestamp, int):
+            timestamp = str(timestamp).encode()
+        h = self._sig_prefix.copy()
+        h.update(timestamp)
+        h.update(payload)
+        h.update(self._app_secret_bytes)
+        return h.hexdigest()
+
+    async def request(
+        self, query: str, variables: Optional[Dict] = None
+    ) -> Dict[str, Any]:
         """
         Faz uma requisição GraphQL à API Shopee.
 
@@ -74,7 +290,8 @@ class ShopeeAPI:
         Raises:
             ShopeeAPIError: Se a requisição falhar
         """
-        timestamp = int(time.time())
+        # Codificado uma vez: usado na assinatura e no header Authorization
+        timestamp = str(int(time.time())).encode()
 
         # Construir payload
         payload_dict = {"query": query}
@@ -83,31 +300,31 @@ class ShopeeAPI:
             variables_clean = {k: v for k, v in variables.items() if v is not None}
             if variables_clean:
                 payload_dict["variables"] = variables_clean
-        payload = json.dumps(payload_dict, separators=(",", ":"))
+        payload = orjson.dumps(payload_dict)  # compacto, sem espaços
 
         # Calcular assinatura
         signature = self._calculate_signature(timestamp, payload)
 
         # Headers
-        headers = {
-            "Authorization": f"SHA256 Credential={self.app_id}, Timestamp={timestamp}, Signature={signature}",
-            "Content-Type": "application/json",
-        }
+        headers = self._base_headers.copy()
+        headers["Authorization"] = b"".join(
+            (self._auth_prefix, timestamp, b", Signature=", signature.encode())
+        )
 
-        # Fazer requisição com timeout
+        # Fazer requisição (timeout configurado no client)
         try:
-            response = self.session.post(
-                self.endpoint, headers=headers, data=payload, timeout=self.timeout
+            response = await self.client.post(
+                self.endpoint, headers=headers, content=payload
             )
             response.raise_for_status()
-        except requests.exceptions.HTTPError as e:
+        except httpx.HTTPStatusError as e:
             raise ShopeeAPIError(
                 f"Erro HTTP {e.response.status_code}: {e.response.text[:200]}"
             ) from e
 
         try:
-            data = response.json()
-        except json.JSONDecodeError:
+            data = orjson.loads(response.content)
+        except orjson.JSONDecodeError:
             raise ShopeeAPIError(
                 f"Erro ao decodificar JSON. Status: {response.status_code}, "
                 f"Conteúdo: {response.text[:200]}"
@@ -123,13 +340,13 @@ class ShopeeAPI:
                 message = extensions.get(
                     "message", error.get("message", "Erro desconhecido")
                 )
-                raise ShopeeAPIError(f"Erro {code}: {message}")
+                raise ShopeeAPIError(f"Erro {code}: {message}", code=code)
             else:
                 raise ShopeeAPIError(f"API retornou um erro sem detalhes: {data}")
 
         return data.get("data", {})
 
-    def buscar_produtos(
+    async def buscar_produtos(
         self,
         keyword: str = "",
         limit: int = 10,
@@ -140,9 +357,12 @@ class ShopeeAPI:
         """
         Busca produtos na Shopee.
 
+        Acima de 500 resultados a busca é paginada, com a próxima página
+        sendo buscada enquanto a atual é processada.
+
         Args:
             keyword: Palavra-chave para busca
-            limit: Número de resultados (máx: 500)
+            limit: Número de resultados (máx: 2000)
             sort_type: Tipo de ordenação (1=relevância, 2=mais vendidos, 5=maior comissão)
             shop_id: Filtrar por ID da loja
             product_cat_id: Filtrar por categoria de produto
@@ -151,73 +371,82 @@ class ShopeeAPI:
             Lista de produtos
         """
         # Validar limit
-        if not isinstance(limit, int) or limit < 1 or limit > 500:
-            raise ValueError(f"limit deve ser entre 1 e 500, recebido: {limit}")
-
-        # Construir query dinamicamente baseado nos parâmetros fornecidos
-        query_params = [
-            "keyword: $keyword",
-            "limit: $limit",
-            "sortType: $sortType",
-        ]
-        query_vars = [
-            "$keyword: String",
-            "$limit: Int!",
-            "$sortType: Int!",
-        ]
-
-        if shop_id is not None:
-            query_params.append("shopId: {}".format(shop_id))
-        if product_cat_id is not None:
-            query_params.append("productCatId: {}".format(product_cat_id))
-
-        query_params_str = "                ".join(query_params)
-        query_vars_str = "            ".join(query_vars)
-
-        query = """
-        query ProductOfferV2(
-            {vars}
-        ) {{
-            productOfferV2(
-                {params}
-            ) {{
-                nodes {{
-                    itemId
-                    productName
-                    price
-                    priceMin
-                    priceMax
-                    commissionRate
-                    commission
-                    sales
-                    ratingStar
-                    priceDiscountRate
-                    imageUrl
-                    productLink
-                    offerLink
-                    shopId
-                    shopName
-                    shopType
-                }}
-                pageInfo {{
-                    page
-                    limit
-                    hasNextPage
-                }}
-            }}
-        }}
-        """.format(vars=query_vars_str, params=query_params_str)
+        if not isinstance(limit, int) or limit < 1 or limit > _MAX_PRODUTOS:
+            raise ValueError(
+                f"limit deve ser entre 1 e {_MAX_PRODUTOS}, recebido: {limit}"
+            )
+
+        # Buscas idênticas dentro do TTL não fazem nova requisição
+        cache_key = (keyword, limit, sort_type, shop_id, product_cat_id)
+        if self.cache_ttl > 0:
+            cached = self._produtos_cache_get(cache_key)
+            if cached is not None:
+                return cached
+
+        query = _PRODUCT_QUERIES[(shop_id is not None, product_cat_id is not None)]
 
         variables = {
             "keyword": keyword or None,
-            "limit": limit,
+            "limit": min(limit, _PAGE_LIMIT),
             "sortType": sort_type,
+            "shopId": shop_id,
+            "productCatId": product_cat_id,
         }
 
-        data = self.request(query, variables)
-        return data.get("productOfferV2", {}).get("nodes", [])
+        if limit <= _PAGE_LIMIT:
+            data = await self.request(query, variables)
+            produtos = data.get("productOfferV2", {}).get("nodes", [])
+        else:
+            produtos = []
+            paginas = -(-limit // _PAGE_LIMIT)
+            async for nodes in self._paginas_produtos(query, variables, paginas):
+                produtos.extend(nodes)
+            del produtos[limit:]
+
+        if self.cache_ttl > 0:
+            self._produtos_cache_set(cache_key, produtos)
+        return produtos
+
+    async def _paginas_produtos(
+        self, query: str, variables: Dict[str, Any], paginas: int
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Gera os nodes de cada página de productOfferV2, em ordem.
 
-    def buscar_ofertas_lojas(
+        A requisição da página N+1 é disparada assim que a página N chega,
+        antes de entregá-la ao consumidor.
+
+        Args:
+            query: Query productOfferV2 com a variável $page
+            variables: Variáveis da query (sem page)
+            paginas: Número máximo de páginas
+
+        Yields:
+            Lista de produtos de cada página
+        """
+
+        def buscar(page: int) -> asyncio.Task:
+            return asyncio.create_task(self.request(query, {**variables, "page": page}))
+
+        pendente: Optional[asyncio.Task] = buscar(1)
+        try:
+            for page in range(1, paginas + 1):
+                data = await pendente
+                conexao = data.get("productOfferV2", {})
+                has_next = conexao.get("pageInfo", {}).get("hasNextPage", False)
+                pendente = buscar(page + 1) if has_next and page < paginas else None
+
+                yield conexao.get("nodes", [])
+
+                if pendente is None:
+                    return
+        finally:
+            # Descartar a página antecipada se o consumidor parar antes
+            if pendente is not None and not pendente.cancel():
+                if not pendente.cancelled():
+                    pendente.exception()
+
+    async def buscar_ofertas_lojas(
         self,
         keyword: str = "",
         limit: int = 10,
@@ -236,35 +465,6 @@ class ShopeeAPI:
         Returns:
             Lista de ofertas de lojas
         """
-        query = """
-        query ShopOfferV2(
-            $keyword: String
-            $limit: Int!
-            $shopType: [Int]
-            $sortType: Int!
-        ) {
-            shopOfferV2(
-                keyword: $keyword
-                limit: $limit
-                shopType: $shopType
-                sortType: $sortType
-            ) {
-                nodes {
-                    shopId
-                    shopName
-                    commissionRate
-                    offerLink
-                    ratingStar
-                    remainingBudget
-                }
-                pageInfo {
-                    page
-                    hasNextPage
-                }
-            }
-        }
-        """
-
         variables = {
             "keyword": keyword or None,
             "limit": limit,
@@ -272,10 +472,10 @@ class ShopeeAPI:
             "sortType": sort_type,
         }
 
-        data = self.request(query, variables)
+        data = await self.request(_SHOP_OFFER_QUERY, variables)
         return data.get("shopOfferV2", {}).get("nodes", [])
 
-    def gerar_link_curto(
+    async def gerar_link_curto(
         self, origin_url: str, sub_ids: Optional[List[str]] = None
     ) -> str:
         """
@@ -288,52 +488,188 @@ class ShopeeAPI:
         Returns:
             Link curto gerado
         """
-        # Validar URL
-        if not origin_url or not isinstance(origin_url, str):
-            raise ValueError("origin_url deve ser uma string não-vazia")
-        if not origin_url.startswith(("http://", "https://")):
-            raise ValueError("origin_url deve começar com http:// ou https://")
-
-        # Validar sub_ids
-        if sub_ids is not None:
-            if not isinstance(sub_ids, list):
-                raise ValueError("sub_ids deve ser uma lista")
-            if len(sub_ids) > 5:
-                raise ValueError("sub_ids pode ter no máximo 5 itens")
-
-        mutation = """
-        mutation GenerateShortLink($input: GenerateShortLinkInput!) {
-            generateShortLink(input: $input) {
-                shortLink
-            }
-        }
-        """
+        _validar_link(origin_url, sub_ids)
+
+        # O mapeamento URL -> link curto é estável, então fica em um LRU
+        cache_key = (origin_url, tuple(sub_ids or ()))
+        cached = self._links_cache_get(cache_key)
+        if cached is not None:
+            return cached
+
         variables = {"input": {"originUrl": origin_url, "subIds": sub_ids or []}}
 
-        data = self.request(mutation, variables)
+        data = await self.request(_SHORT_LINK_MUTATION, variables)
         short_link = data.get("generateShortLink", {}).get("shortLink", "")
 
         if not short_link:
             raise ShopeeAPIError(f"Falha ao gerar link curto. Resposta: {data}")
 
+        self._links_cache_set(cache_key, short_link)
         return short_link
 
-    def __enter__(self):
-        """Suporte para context manager."""
+    async def gerar_links_curtos(self, origin_urls: List[str]) -> List[str]:
+        """
+        Gera vários links curtos com uma única mutation (aliases l0, l1, ...).
+
+        Args:
+            origin_urls: URLs originais dos produtos
+
+        Returns:
+            Links curtos na mesma ordem de origin_urls
+
+        Raises:
+            ShopeeAPIError: Se algum link do lote não for gerado
+        """
+        for origin_url in origin_urls:
+            _validar_link(origin_url, None)
+
+        links: Dict[str, str] = {}
+        pendentes: List[str] = []
+        for origin_url in origin_urls:
+            cached = self._links_cache_get((origin_url, ()))
+            if cached is not None:
+                links[origin_url] = cached
+            elif origin_url not in pendentes:
+                pendentes.append(origin_url)
+
+        if pendentes:
+            variables = {
+                f"i{i}": {"originUrl": origin_url, "subIds": []}
+                for i, origin_url in enumerate(pendentes)
+            }
+            data = await self.request(_batch_link_mutation(len(pendentes)), variables)
+
+            for i, origin_url in enumerate(pendentes):
+                short_link = (data.get(f"l{i}") or {}).get("shortLink", "")
+                if not short_link:
+                    raise ShopeeAPIError(
+                        f"Falha ao gerar link curto para {origin_url}. Resposta: {data}",
+                        por_item=True,
+                    )
+                self._links_cache_set((origin_url, ()), short_link)
+                links[origin_url] = short_link
+
+        return [links[origin_url] for origin_url in origin_urls]
+
+    def _links_cache_get(self, key: Tuple) -> Optional[str]:
+        """Retorna um link curto já gerado, marcando-o como usado recentemente."""
+        cached = self._links_cache.get(key)
+        if cached is not None:
+            self._links_cache.move_to_end(key)
+        return cached
+
+    def _links_cache_set(self, key: Tuple, short_link: str) -> None:
+        """Armazena um link curto, descartando o menos usado se cheio."""
+        self._links_cache[key] = short_link
+        if len(self._links_cache) > _LINKS_CACHE_MAX:
+            self._links_cache.popitem(last=False)
+
+    async def __aenter__(self):
+        """Suporte para async context manager."""
         return self
 
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        """Suporte para context manager - fecha a sessão."""
-        self.close()
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """Suporte para async context manager - fecha o client."""
+        await self.aclose()
         return False  # Não suprime exceções
 
-    def close(self):
-        """Fecha a sessão HTTP para liberar recursos."""
-        if self.session:
-            self.session.close()
+    async def aclose(self):
+        """Fecha o client HTTP para liberar as conexões do pool."""
+        await self.client.aclose()
 
 
-def get_tipo_loja(shop_type_list: Optional[List[int]]) -> str:
+class LinkBatcher:
+    """
+    Agrupa chamadas concorrentes de link curto em uma única requisição.
+
+    Pedidos que chegam dentro de max_wait_ms (até max_batch) viram uma só
+    mutation via ShopeeAPI.gerar_links_curtos; cada chamador recebe o seu link.
+    """
+
+    def __init__(self, api: ShopeeAPI, max_batch: int = 16, max_wait_ms: float = 20):
+        self.api = api
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._dispatches: set = set()
+
+    async def submit(self, origin_url: str) -> str:
+        """Enfileira uma URL e aguarda o link curto correspondente."""
+        _validar_link(origin_url, None)
+
+        cached = self.api._links_cache_get((origin_url, ()))
+        if cached is not None:
+            return cached
+
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((origin_url, future))
+        return await future
+
+    async def _run(self) -> None:
+        """Coleta lotes da fila e dispara cada um sem bloquear a coleta."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            task = asyncio.create_task(self._dispatch(batch))
+            self._dispatches.add(task)
+            task.add_done_callback(self._dispatches.discard)
+
+    async def _dispatch(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        """Envia um lote e entrega o resultado (ou erro) a cada chamador."""
+        urls = [origin_url for origin_url, _ in batch]
+        try:
+            results: List[Any] = await self.api.gerar_links_curtos(urls)
+        except ShopeeAPIError as e:
+            if len(batch) == 1 or not e.por_item:
+                # Limite de requisições, autenticação, HTTP...: repetir por URL
+                # só multiplicaria as falhas; todos recebem o mesmo erro
+                results = [e] * len(batch)
+            else:
+                # Uma URL rejeitada não deve derrubar o lote inteiro
+                results = await asyncio.gather(
+                    *(self.api.gerar_link_curto(origin_url) for origin_url in urls),
+                    return_exceptions=True,
+                )
+        except Exception as e:
+            results = [e] * len(batch)
+
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def aclose(self) -> None:
+        """Encerra o worker de coleta e aguarda os lotes em andamento."""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        if self._dispatches:
+            await asyncio.gather(*self._dispatches, return_exceptions=True)
+
+
+def get_tipo_loja(shop_type_list: Optional[Sequence[int]]) -> str:
     """
     Retorna o tipo de loja baseado nos shopType.
 
@@ -345,15 +681,64 @@ def get_tipo_loja(shop_type_list: Optional[List[int]]) -> str:
     """
     if not shop_type_list:
         return ""
-    if 1 in shop_type_list:
+    # Poucas combinações de shopType se repetem: resolvidas uma vez por tupla
+    try:
+        return _tipo_loja(tuple(shop_type_list))
+    except TypeError:
+        return ""  # Itens não hasheáveis: nenhum é um shopType conhecido
+
+
+@functools.lru_cache(maxsize=512)
+def _tipo_loja(shop_types: Tuple[int, ...]) -> str:
+    """Classifica uma combinação (tupla) de shopType."""
+    # Uma única passada monta a máscara (bit n = shopType n presente)
+    mask = 0
+    for shop_type in shop_types:
+        mask |= _SHOP_TYPE_BITS.get(shop_type, 0)
+    if mask & _SHOP_TYPE_MALL:
         return "Mall"
-    if 4 in shop_type_list:
+    if mask & _SHOP_TYPE_STAR_PLUS:
         return "Star+"
-    if 2 in shop_type_list:
+    if mask & _SHOP_TYPE_STAR:
         return "Star"
     return ""
 
 
+async def _executar(args: argparse.Namespace) -> None:
+    """Executa o comando da CLI com um client assíncrono."""
+    async with ShopeeAPI() as api:
+        if args.link:
+            # Gerar link curto
+            link = await api.gerar_link_curto(args.link)
+            print(f"🔗 Link curto: {link}")
+
+        else:
+            # Buscar produtos
+            produtos = await api.buscar_produtos(
+                keyword=args.keyword or "", limit=args.limit, shop_id=args.shop
+            )
+
+            print(f"\n📦 {len(produtos)} produtos encontrados:\n")
+
+            for i, p in enumerate(produtos, 1):
+                comissao_pct = float(p.get("commissionRate", "0")) * 100
+                loja_tipo = p.get("shopType") or []
+
+                tipo_str = get_tipo_loja(loja_tipo)
+
+                print(f"{i}. {p.get('productName', 'N/A')}")
+                print(f"   💰 Preço: R$ {p.get('price', 'N/A')}")
+                print(
+                    f"   💵 Comissão: {comissao_pct:.1f}% (R$ {p.get('commission', 'N/A')})"
+                )
+                print(f"   🛒 Vendidos: {p.get('sales', 0)}")
+                print(f"   ⭐ Avaliação: {p.get('ratingStar', 'N/A')}")
+                if tipo_str:
+                    print(f"   🏪 {tipo_str}")
+                print(f"   🔗 {p.get('offerLink', 'N/A')}")
+                print()
+
+
 def main():
     """Exemplo de uso da API"""
 
@@ -368,41 +753,11 @@ def main():
     args = parser.parse_args()
 
     try:
-        with ShopeeAPI() as api:
-            if args.link:
-                # Gerar link curto
-                link = api.gerar_link_curto(args.link)
-                print(f"🔗 Link curto: {link}")
-
-            else:
-                # Buscar produtos
-                produtos = api.buscar_produtos(
-                    keyword=args.keyword or "", limit=args.limit, shop_id=args.shop
-                )
-
-                print(f"\n📦 {len(produtos)} produtos encontrados:\n")
-
-                for i, p in enumerate(produtos, 1):
-                    comissao_pct = float(p.get("commissionRate", "0")) * 100
-                    loja_tipo = p.get("shopType") or []
-
-                    tipo_str = get_tipo_loja(loja_tipo)
-
-                    print(f"{i}. {p.get('productName', 'N/A')}")
-                    print(f"   💰 Preço: R$ {p.get('price', 'N/A')}")
-                    print(
-                        f"   💵 Comissão: {comissao_pct:.1f}% (R$ {p.get('commission', 'N/A')})"
-                    )
-                    print(f"   🛒 Vendidos: {p.get('sales', 0)}")
-                    print(f"   ⭐ Avaliação: {p.get('ratingStar', 'N/A')}")
-                    if tipo_str:
-                        print(f"   🏪 {tipo_str}")
-                    print(f"   🔗 {p.get('offerLink', 'N/A')}")
-                    print()
+        asyncio.run(_executar(args))
     except ShopeeAPIError as e:
         print(f"❌ Erro da API: {e}", file=sys.stderr)
         sys.exit(1)
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         print(f"❌ Erro de rede: {e}", file=sys.stderr)
         sys.exit(1)
 
@@ -6,16 +6,223 @@ Coleta métricas, gera relatórios e fornece insights sobre
 a execução dos testes ao longo do tempo.
 """
 
-import json
+import heapq
 import sqlite3
-import statistics
-from dataclasses import dataclass, field
-from datetime import datetime, timedelta
-from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, ContextManager, Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+# Quantos testes instáveis/lentos o relatório lista
+_REPORT_TOP_N = 10
+
+_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -65536",  # 64 MiB
+    "PRAGMA mmap_size = 268435456",  # 256 MiB
+    "PRAGMA wal_autocheckpoint = 1000",
+)
+
+# Todo SQL fica em constantes de módulo com parâmetros "?": o texto é
+# sempre o mesmo objeto e o statement preparado é reaproveitado do cache
+_CACHED_STATEMENTS = 256
+
+# Timestamps são epoch em segundos (INTEGER): comparação e índice baratos
+_EXECUTIONS_COLUMNS = """(
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp INTEGER NOT NULL,
+    duration REAL NOT NULL,
+    total_tests INTEGER NOT NULL,
+    passed INTEGER NOT NULL,
+    failed INTEGER NOT NULL,
+    errors INTEGER NOT NULL,
+    success_rate REAL NOT NULL,
+    parallel INTEGER NOT NULL,
+    workers INTEGER NOT NULL
+)"""
+
+_TEST_RESULTS_COLUMNS = """(
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    execution_id INTEGER NOT NULL,
+    test_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    duration REAL NOT NULL,
+    error TEXT,
+    timestamp INTEGER NOT NULL,
+    FOREIGN KEY (execution_id) REFERENCES executions (id)
+)"""
+
+# Rollup diário por teste, mantido na gravação: leituras por teste somam
+# no máximo um bucket por dia em vez de todas as execuções
+_TEST_STATS_COLUMNS = """(
+    test_id TEXT NOT NULL,
+    day INTEGER NOT NULL,
+    total INTEGER NOT NULL,
+    failures INTEGER NOT NULL,
+    sum_dur REAL NOT NULL,
+    sum_dur_sq REAL NOT NULL,
+    min_dur REAL NOT NULL,
+    max_dur REAL NOT NULL,
+    last_ts INTEGER NOT NULL,
+    PRIMARY KEY (test_id, day)
+) WITHOUT ROWID"""
+
+_UPSERT_TEST_STATS_SQL = """
+    INSERT INTO test_stats
+    (test_id, day, total, failures, sum_dur, sum_dur_sq, min_dur, max_dur, last_ts)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (test_id, day) DO UPDATE SET
+        total = total + excluded.total,
+        failures = failures + excluded.failures,
+        sum_dur = sum_dur + excluded.sum_dur,
+        sum_dur_sq = sum_dur_sq + excluded.sum_dur_sq,
+        min_dur = MIN(min_dur, excluded.min_dur),
+        max_dur = MAX(max_dur, excluded.max_dur),
+        last_ts = MAX(last_ts, excluded.last_ts)
+"""
+
+_BACKFILL_TEST_STATS_SQL = """
+    INSERT INTO test_stats
+    (test_id, day, total, failures, sum_dur, sum_dur_sq, min_dur, max_dur, last_ts)
+    SELECT
+        test_id,
+        timestamp / 86400,
+        COUNT(*),
+        SUM(CASE WHEN status != 'passed' THEN 1 ELSE 0 END),
+        SUM(duration),
+        SUM(duration * duration),
+        MIN(duration),
+        MAX(duration),
+        MAX(timestamp)
+    FROM test_results
+    GROUP BY test_id, timestamp / 86400
+"""
+
+_INSERT_EXECUTION_SQL = """
+    INSERT INTO executions
+    (timestamp, duration, total_tests, passed, failed, errors, success_rate, parallel, workers)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+_INSERT_TEST_RESULT_SQL = """
+    INSERT INTO test_results
+    (execution_id, test_id, status, duration, error, timestamp)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
 
+_SELECT_TEST_METRICS_SQL = """
+    SELECT
+        test_id,
+        SUM(sum_dur) / SUM(total) as avg_duration,
+        MIN(min_dur) as min_duration,
+        MAX(max_dur) as max_duration,
+        SUM(total) as total_runs,
+        SUM(failures) as failures,
+        4.0 * SUM(failures) * (SUM(total) - SUM(failures)) / (SUM(total) * SUM(total)) as flakiness,
+        MAX(last_ts) as last_run
+    FROM test_stats
+    WHERE test_id = ? AND day >= ?
+    GROUP BY test_id
+"""
 
-@dataclass
+# flakiness = variância do indicador de falha f (0/1), normalizada para 0-1:
+# 4 * (E[f²] - E[f]²). Zero quando o teste sempre passa ou sempre falha,
+# máxima quando alterna meio a meio.
+_SELECT_PER_TEST_SQL = """
+    SELECT
+        test_id,
+        AVG(duration) as avg_duration,
+        MIN(duration) as min_duration,
+        MAX(duration) as max_duration,
+        COUNT(*) as total_runs,
+        CAST(SUM(f) AS INTEGER) as failures,
+        4 * (AVG(f * f) - AVG(f) * AVG(f)) as flakiness
+    FROM (
+        SELECT
+            test_id,
+            duration,
+            CASE WHEN status != 'passed' THEN 1.0 ELSE 0.0 END as f
+        FROM test_results
+        WHERE timestamp >= ?
+    )
+    GROUP BY test_id
+"""
+
+# LIMIT -1 = sem limite; o mesmo statement serve com ou sem limit
+_SELECT_FLAKY_SQL = _SELECT_PER_TEST_SQL + """
+    HAVING flakiness > ?
+    ORDER BY flakiness DESC, failures DESC
+    LIMIT ?
+"""
+
+_SELECT_SLOW_SQL = _SELECT_PER_TEST_SQL + """
+    HAVING AVG(duration) > ?
+    ORDER BY avg_duration DESC
+    LIMIT ?
+"""
+
+_SELECT_EXECUTIONS_SUMMARY_SQL = """
+    SELECT
+        COALESCE(COUNT(*), 0) as total_executions,
+        COALESCE(AVG(duration), 0) as avg_duration,
+        COALESCE(AVG(success_rate), 0) as avg_success_rate,
+        COALESCE(SUM(passed), 0) as total_passed,
+        COALESCE(SUM(failed), 0) as total_failed,
+        COALESCE(SUM(errors), 0) as total_errors
+    FROM executions
+    WHERE timestamp >= ?
+"""
+
+_SELECT_GENERATION_SQL = """
+    SELECT
+        (SELECT MAX(id) FROM executions),
+        (SELECT MAX(id) FROM test_results)
+"""
+
+_SELECT_EXECUTION_ORDER_SQL = """
+    SELECT
+        test_id,
+        SUM(sum_dur) / SUM(total) as avg_duration,
+        SUM(failures) as failures
+    FROM test_stats
+    WHERE day >= ?
+    GROUP BY test_id
+    ORDER BY failures DESC, avg_duration DESC
+"""
+
+
+def _to_epoch(value: Any) -> Optional[int]:
+    """Converte datetime, ISO-8601 ou número em epoch (segundos)."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return int(value.timestamp())
+    if isinstance(value, str):
+        try:
+            return int(datetime.fromisoformat(value).timestamp())
+        except ValueError:
+            pass
+    return int(float(value))
+
+
+def _cutoff(days: int) -> int:
+    """
+    Início (epoch) da janela de `days` dias.
+
+    Alinhado ao início do dia (UTC) para coincidir com os buckets de
+    test_stats: consultas no rollup (day >= cutoff // 86400) e nas tabelas
+    brutas (timestamp >= cutoff) cobrem exatamente o mesmo período.
+    """
+    return (int(time.time()) // 86400 - days) * 86400
+
+
+@dataclass(slots=True)
 class TestMetrics:
     """Métricas de um teste específico."""
     test_id: str
@@ -25,11 +232,26 @@ class TestMetrics:
     success_rate: float
     total_runs: int
     failures: int
-    flakiness_score: float  # 0-1, quanto maior mais instável
+    flakiness_score: float  # 0-1, variância normalizada de passa/falha (maior = mais instável)
     last_run: datetime
 
+    @classmethod
+    def from_row(cls, row: Sequence, last_run: datetime) -> "TestMetrics":
+        """
+        Cria a partir de uma linha agregada (test_id, avg, min, max, total, failures, flakiness).
 
-@dataclass
+        Atribui os slots diretamente, sem passar pelo __init__ gerado
+        (caminho quente ao montar listas de métricas).
+        """
+        obj = object.__new__(cls)
+        (obj.test_id, obj.avg_duration, obj.min_duration, obj.max_duration,
+         obj.total_runs, obj.failures, obj.flakiness_score) = row
+        obj.success_rate = (obj.total_runs - obj.failures) / obj.total_runs * 100
+        obj.last_run = last_run
+        return obj
+
+
+@dataclass(slots=True)
 class ExecutionMetrics:
     """Métricas de uma execução completa."""
     timestamp: datetime
@@ -43,73 +265,151 @@ class ExecutionMetrics:
     workers: int
 
 
+class _ConnHolder:
+    """Conexão de uma thread; o fechamento fica atrelado ao tempo de vida do objeto."""
+
+    __slots__ = ("conn", "__weakref__")
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+
 class TestAnalytics:
     """Analisa métricas históricas dos testes."""
 
     def __init__(self, db_path: str = "test_analytics.db"):
         self.db_path = db_path
+        # Uma conexão persistente por thread (statements preparados ficam em cache)
+        self._local = threading.local()
+        # Holders vivos (um por thread); somem junto com a thread que os criou
+        self._holders: "weakref.WeakSet[_ConnHolder]" = weakref.WeakSet()
+        self._holders_lock = threading.Lock()
         self._init_db()
 
-    def _init_db(self) -> None:
-        """Inicializa o banco de dados SQLite."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        # Habilitar foreign keys
-        cursor.execute("PRAGMA foreign_keys = ON")
-
-        # Tabela de execuções
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS executions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp TEXT NOT NULL,
-                duration REAL NOT NULL,
-                total_tests INTEGER NOT NULL,
-                passed INTEGER NOT NULL,
-                failed INTEGER NOT NULL,
-                errors INTEGER NOT NULL,
-                success_rate REAL NOT NULL,
-                parallel INTEGER NOT NULL,
-                workers INTEGER NOT NULL
+    def _conn(self) -> sqlite3.Connection:
+        """Conexão da thread atual, aberta e configurada no primeiro uso."""
+        holder = getattr(self._local, "holder", None)
+        if holder is None:
+            # check_same_thread=False só para close() poder fechar todas;
+            # cada conexão é usada apenas pela thread que a abriu
+            conn = sqlite3.connect(
+                self.db_path, check_same_thread=False, cached_statements=_CACHED_STATEMENTS
             )
-        """)
-
-        # Criar índice para timestamp
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_executions_timestamp
-            ON executions(timestamp)
-        """)
-
-        # Tabela de resultados individuais
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS test_results (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                execution_id INTEGER NOT NULL,
-                test_id TEXT NOT NULL,
-                status TEXT NOT NULL,
-                duration REAL NOT NULL,
-                error TEXT,
-                timestamp TEXT NOT NULL,
-                FOREIGN KEY (execution_id) REFERENCES executions (id)
-            )
-        """)
-
-        conn.commit()
-        conn.close()
-
-    def record_execution(self, execution_id: int, summary: Dict) -> None:
-        """Registra uma execução completa."""
-        from orchestrator import ExecutionSummary
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA foreign_keys = ON")
+            # Journal e cache ajustados para muitas gravações pequenas
+            for pragma in _PRAGMAS:
+                conn.execute(pragma)
+            holder = _ConnHolder(conn)
+            # Quando a thread termina, o threading.local libera o holder e a
+            # conexão é fechada (threads de pools não acumulam descritores)
+            weakref.finalize(holder, conn.close)
+            self._local.holder = holder
+            with self._holders_lock:
+                self._holders.add(holder)
+        return holder.conn
+
+    def close(self) -> None:
+        """Fecha as conexões com o banco."""
+        with self._holders_lock:
+            holders = list(self._holders)
+            self._holders = weakref.WeakSet()
+        for holder in holders:
+            holder.conn.close()
+        self._local = threading.local()
+
+    def _fetchone(self, sql: str, params: Tuple = ()) -> Optional[Tuple]:
+        return self._conn().execute(sql, params).fetchone()
+
+    @contextmanager
+    def _query(self, sql: str, params: Tuple = ()) -> Iterator[sqlite3.Cursor]:
+        """Cursor para iterar as linhas sob demanda (sem fetchall)."""
+        cursor = self._conn().execute(sql, params)
+        try:
+            yield cursor
+        finally:
+            cursor.close()
 
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        cursor.execute("""
-            INSERT INTO executions
-            (timestamp, duration, total_tests, passed, failed, errors, success_rate, parallel, workers)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            datetime.now().isoformat(),
+    def _init_db(self) -> None:
+        """
+        Inicializa o banco de dados SQLite.
+
+        Usa WAL (leitores não bloqueiam o escritor e há menos fsyncs);
+        o arquivo do banco precisa estar em um sistema de arquivos local.
+        """
+        conn = self._conn()
+        with conn:
+            cursor = conn.cursor()
+
+            self._migrate_text_timestamps(conn, cursor)
+
+            # Tabela de execuções
+            cursor.execute(f"CREATE TABLE IF NOT EXISTS executions {_EXECUTIONS_COLUMNS}")
+
+            # Criar índice para timestamp
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_executions_timestamp
+                ON executions(timestamp)
+            """)
+
+            # Tabela de resultados individuais
+            cursor.execute(f"CREATE TABLE IF NOT EXISTS test_results {_TEST_RESULTS_COLUMNS}")
+
+            # Consultas por teste filtram test_id + período; agregados gerais só o período
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_results_test_time
+                ON test_results(test_id, timestamp)
+            """)
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_results_time
+                ON test_results(timestamp)
+            """)
+
+            # Rollup por teste/dia; preenchido a partir do histórico na criação
+            has_stats = cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'test_stats'"
+            ).fetchone()
+            cursor.execute(f"CREATE TABLE IF NOT EXISTS test_stats {_TEST_STATS_COLUMNS}")
+            if not has_stats:
+                cursor.execute(_BACKFILL_TEST_STATS_SQL)
+
+    @staticmethod
+    def _migrate_text_timestamps(conn: sqlite3.Connection, cursor: sqlite3.Cursor) -> None:
+        """Converte bancos antigos (timestamp ISO em TEXT) para epoch INTEGER."""
+        pending = []
+        for table, columns in (("executions", _EXECUTIONS_COLUMNS),
+                               ("test_results", _TEST_RESULTS_COLUMNS)):
+            info = cursor.execute(f"PRAGMA table_info({table})").fetchall()
+            if any(col["name"] == "timestamp" and col["type"].upper() == "TEXT" for col in info):
+                pending.append((table, columns, [col["name"] for col in info]))
+        if not pending:
+            return
+
+        # Afinidade TEXT converteria os inteiros de volta: recriar as tabelas
+        conn.create_function("to_epoch", 1, _to_epoch, deterministic=True)
+        # Sem foreign keys durante a troca (DROP da tabela referenciada)
+        cursor.execute("PRAGMA foreign_keys = OFF")
+        try:
+            cursor.execute("BEGIN")
+            for table, columns, names in pending:
+                select = ", ".join("to_epoch(timestamp)" if n == "timestamp" else n for n in names)
+                cursor.execute(f"CREATE TABLE {table}_new {columns}")
+                cursor.execute(
+                    f"INSERT INTO {table}_new ({', '.join(names)}) SELECT {select} FROM {table}"
+                )
+                cursor.execute(f"DROP TABLE {table}")
+                cursor.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.execute("PRAGMA foreign_keys = ON")
+
+    @staticmethod
+    def _execution_params(summary: Dict, timestamp: int) -> Tuple:
+        return (
+            timestamp,
             summary.get("duration", 0),
             summary.get("total", 0),
             summary.get("passed", 0),
@@ -118,34 +418,68 @@ class TestAnalytics:
             summary.get("success_rate", 0),
             1 if summary.get("parallel") else 0,
             summary.get("workers", 1)
-        ))
+        )
 
-        conn.commit()
-        conn.close()
+    def record_execution(self, execution_id: int, summary: Dict) -> int:
+        """Registra uma execução completa e retorna o id gerado."""
+        params = self._execution_params(summary, int(time.time()))
+        conn = self._conn()
+        with conn:
+            return conn.execute(_INSERT_EXECUTION_SQL, params).lastrowid
+
+    def record_executions(self, rows: List[Dict]) -> None:
+        """Registra várias execuções em uma única transação."""
+        timestamp = int(time.time())
+        params = [self._execution_params(row, timestamp) for row in rows]
+        conn = self._conn()
+        with conn:
+            conn.executemany(_INSERT_EXECUTION_SQL, params)
+
+    def record_test_results(self, execution_id: int, results: List[Dict]) -> None:
+        """Registra os resultados individuais de uma execução em lote."""
+        now = int(time.time())
+        params = [
+            (
+                execution_id,
+                r["test_id"],
+                r.get("status", "passed"),
+                r.get("duration", 0),
+                r.get("error") or None,
+                _to_epoch(r.get("timestamp")) or now,
+            )
+            for r in results
+        ]
+
+        # Consolidar o lote por (teste, dia) antes de atualizar o rollup
+        stats: Dict[Tuple[str, int], List] = {}
+        for _, test_id, status, duration, _, timestamp in params:
+            key = (test_id, timestamp // 86400)
+            failed = 0 if status == "passed" else 1
+            entry = stats.get(key)
+            if entry is None:
+                stats[key] = [1, failed, duration, duration * duration, duration, duration, timestamp]
+            else:
+                entry[0] += 1
+                entry[1] += failed
+                entry[2] += duration
+                entry[3] += duration * duration
+                entry[4] = min(entry[4], duration)
+                entry[5] = max(entry[5], duration)
+                entry[6] = max(entry[6], timestamp)
+
+        conn = self._conn()
+        with conn:
+            conn.executemany(_INSERT_TEST_RESULT_SQL, params)
+            conn.executemany(
+                _UPSERT_TEST_STATS_SQL,
+                [(test_id, day, *entry) for (test_id, day), entry in stats.items()],
+            )
 
     def get_test_metrics(self, test_id: str, days: int = 30) -> TestMetrics:
-        """Obtém métricas de um teste específico."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        cutoff = (datetime.now() - timedelta(days=days)).isoformat()
-
-        cursor.execute("""
-            SELECT
-                test_id,
-                AVG(duration) as avg_duration,
-                MIN(duration) as min_duration,
-                MAX(duration) as max_duration,
-                COUNT(*) as total_runs,
-                SUM(CASE WHEN status != 'passed' THEN 1 ELSE 0 END) as failures,
-                MAX(timestamp) as last_run
-            FROM test_results
-            WHERE test_id = ? AND timestamp > ?
-            GROUP BY test_id
-        """, (test_id, cutoff))
-
-        row = cursor.fetchone()
-        conn.close()
+        """Obtém métricas de um teste específico (via rollup; mesma janela de _cutoff)."""
+        cutoff = _cutoff(days)
+
+        row = self._fetchone(_SELECT_TEST_METRICS_SQL, (test_id, cutoff // 86400))
 
         if not row:
             return TestMetrics(
@@ -160,12 +494,9 @@ class TestAnalytics:
                 last_run=datetime.now()
             )
 
-        test_id, avg_dur, min_dur, max_dur, total, failures, last_run = row
+        test_id, avg_dur, min_dur, max_dur, total, failures, flakiness, last_run = row
         success_rate = ((total - failures) / total * 100) if total > 0 else 0
 
-        # Calcular flakiness (variação na taxa de sucesso)
-        flakiness = failures / total if total > 0 else 0
-
         return TestMetrics(
             test_id=test_id,
             avg_duration=avg_dur,
@@ -175,115 +506,48 @@ class TestAnalytics:
             total_runs=total,
             failures=failures,
             flakiness_score=flakiness,
-            last_run=datetime.fromisoformat(last_run)
+            last_run=datetime.fromtimestamp(last_run)
         )
 
-    def get_flaky_tests(self, threshold: float = 0.2, days: int = 30) -> List[TestMetrics]:
-        """Retorna testes instáveis acima do threshold."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        cutoff = (datetime.now() - timedelta(days=days)).isoformat()
-
-        cursor.execute("""
-            SELECT
-                test_id,
-                AVG(duration) as avg_duration,
-                MIN(duration) as min_duration,
-                MAX(duration) as max_duration,
-                COUNT(*) as total_runs,
-                SUM(CASE WHEN status != 'passed' THEN 1 ELSE 0 END) as failures
-            FROM test_results
-            WHERE timestamp > ?
-            GROUP BY test_id
-            HAVING (CAST(SUM(CASE WHEN status != 'passed' THEN 1 ELSE 0 END) AS FLOAT) / COUNT(*)) > ?
-            ORDER BY failures DESC
-        """, (cutoff, threshold))
-
-        rows = cursor.fetchall()
-        conn.close()
-
-        results = []
-        for row in rows:
-            test_id, avg_dur, min_dur, max_dur, total, failures = row
-            flakiness = failures / total if total > 0 else 0
-            results.append(TestMetrics(
-                test_id=test_id,
-                avg_duration=avg_dur,
-                min_duration=min_dur,
-                max_duration=max_dur,
-                success_rate=((total - failures) / total * 100),
-                total_runs=total,
-                failures=failures,
-                flakiness_score=flakiness,
-                last_run=datetime.now()
-            ))
-
-        return results
-
-    def get_slow_tests(self, threshold: float = 1.0, days: int = 30) -> List[TestMetrics]:
-        """Retorna testes lentos acima do threshold (segundos)."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        cutoff = (datetime.now() - timedelta(days=days)).isoformat()
-
-        cursor.execute("""
-            SELECT
-                test_id,
-                AVG(duration) as avg_duration,
-                MIN(duration) as min_duration,
-                MAX(duration) as max_duration,
-                COUNT(*) as total_runs,
-                SUM(CASE WHEN status != 'passed' THEN 1 ELSE 0 END) as failures
-            FROM test_results
-            WHERE timestamp > ?
-            GROUP BY test_id
-            HAVING AVG(duration) > ?
-            ORDER BY avg_duration DESC
-        """, (cutoff, threshold))
-
-        rows = cursor.fetchall()
-        conn.close()
-
-        results = []
-        for row in rows:
-            test_id, avg_dur, min_dur, max_dur, total, failures = row
-            results.append(TestMetrics(
-                test_id=test_id,
-                avg_duration=avg_dur,
-                min_duration=min_dur,
-                max_duration=max_dur,
-                success_rate=((total - failures) / total * 100),
-                total_runs=total,
-                failures=failures,
-                flakiness_score=failures / total,
-                last_run=datetime.now()
-            ))
-
-        return results
+    def _aggregate_per_test(self, cutoff: int) -> ContextManager[sqlite3.Cursor]:
+        """
+        Agrega todos os testes do período em uma única passada.
+
+        Context manager com o cursor das linhas agregadas; TestMetrics só
+        é criado para as linhas que passam nos filtros.
+        """
+        return self._query(_SELECT_PER_TEST_SQL, (cutoff,))
+
+    @staticmethod
+    def _is_flaky_row(row: sqlite3.Row, threshold: float) -> bool:
+        return row["flakiness"] > threshold
+
+    @staticmethod
+    def _is_slow_row(row: sqlite3.Row, threshold: float) -> bool:
+        return row["avg_duration"] > threshold
+
+    def get_flaky_tests(self, threshold: float = 0.2, days: int = 30,
+                        limit: Optional[int] = None) -> List[TestMetrics]:
+        """Retorna testes instáveis acima do threshold (no máximo `limit`)."""
+        cutoff = _cutoff(days)
+        now = datetime.now()
+        with self._query(_SELECT_FLAKY_SQL, (cutoff, threshold, -1 if limit is None else limit)) as cursor:
+            return [TestMetrics.from_row(row, now) for row in cursor]
+
+    def get_slow_tests(self, threshold: float = 1.0, days: int = 30,
+                       limit: Optional[int] = None) -> List[TestMetrics]:
+        """Retorna testes lentos acima do threshold em segundos (no máximo `limit`)."""
+        cutoff = _cutoff(days)
+        now = datetime.now()
+        with self._query(_SELECT_SLOW_SQL, (cutoff, threshold, -1 if limit is None else limit)) as cursor:
+            return [TestMetrics.from_row(row, now) for row in cursor]
 
     def generate_report(self, days: int = 30) -> str:
         """Gera relatório de analytics."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        cutoff = (datetime.now() - timedelta(days=days)).isoformat()
+        cutoff = _cutoff(days)
 
         # Métricas gerais com COALESCE para NULL handling
-        cursor.execute("""
-            SELECT
-                COALESCE(COUNT(*), 0) as total_executions,
-                COALESCE(AVG(duration), 0) as avg_duration,
-                COALESCE(AVG(success_rate), 0) as avg_success_rate,
-                COALESCE(SUM(passed), 0) as total_passed,
-                COALESCE(SUM(failed), 0) as total_failed,
-                COALESCE(SUM(errors), 0) as total_errors
-            FROM executions
-            WHERE timestamp > ?
-        """, (cutoff,))
-
-        row = cursor.fetchone()
+        row = self._fetchone(_SELECT_EXECUTIONS_SUMMARY_SQL, (cutoff,))
         total_execs, avg_dur, avg_success, total_passed, total_failed, total_errors = row or (0, 0, 0, 0, 0, 0)
 
         report = []
@@ -297,33 +561,69 @@ class TestAnalytics:
         report.append(f"Testes falhados: {total_failed}")
         report.append(f"Erros: {total_errors}")
 
+        # Uma única agregação por teste alimenta as duas seções abaixo;
+        # só os _REPORT_TOP_N primeiros de cada uma ficam em memória
+        flaky_count = slow_count = 0
+        flaky_top: List[Tuple] = []
+        slow_top: List[Tuple] = []
+        with self._aggregate_per_test(cutoff) as cursor:
+            for seq, row in enumerate(cursor):
+                # -seq: em caso de empate vence o que apareceu primeiro
+                if self._is_flaky_row(row, 0.2):
+                    flaky_count += 1
+                    _push_top(flaky_top, (row["flakiness"], row["failures"], -seq, row), _REPORT_TOP_N)
+                if self._is_slow_row(row, 1.0):
+                    slow_count += 1
+                    _push_top(slow_top, (row["avg_duration"], -seq, row), _REPORT_TOP_N)
+        now = datetime.now()
+
         # Testes instáveis
-        flaky = self.get_flaky_tests(days=days)
-        if flaky:
-            report.append(f"\n⚠️  TESTES INSTÁVEIS ({len(flaky)}):")
-            for metrics in flaky[:10]:
+        if flaky_count:
+            report.append(f"\n⚠️  TESTES INSTÁVEIS ({flaky_count}):")
+            for metrics in (TestMetrics.from_row(r, now) for *_, r in sorted(flaky_top, reverse=True)):
                 report.append(f"   - {metrics.test_id}")
-                report.append(f"     Falhas: {metrics.failures}/{metrics.total_runs} ({metrics.flakiness_score*100:.1f}%)")
+                report.append(f"     Falhas: {metrics.failures}/{metrics.total_runs} ({100 - metrics.success_rate:.1f}%), instabilidade {metrics.flakiness_score:.2f}")
 
         # Testes lentos
-        slow = self.get_slow_tests(days=days)
-        if slow:
-            report.append(f"\n🐌 TESTES LENTOS ({len(slow)}):")
-            for metrics in slow[:10]:
+        if slow_count:
+            report.append(f"\n🐌 TESTES LENTOS ({slow_count}):")
+            for metrics in (TestMetrics.from_row(r, now) for *_, r in sorted(slow_top, reverse=True)):
                 report.append(f"   - {metrics.test_id}")
                 report.append(f"     Duração média: {metrics.avg_duration:.2f}s")
 
         report.append("=" * 60)
 
-        conn.close()
         return "\n".join(report)
 
 
+def _push_top(heap: List[Tuple], item: Tuple, n: int) -> None:
+    """Mantém em `heap` apenas os `n` maiores itens vistos."""
+    if len(heap) < n:
+        heapq.heappush(heap, item)
+    elif item > heap[0]:
+        heapq.heapreplace(heap, item)
+
+
+def _speedup_kernel(durations: List[float], workers: int) -> float:
+    """
+    Speedup estimado para executar `durations` em `workers` paralelos.
+
+    O tempo paralelo nunca é menor que o teste mais longo, então o
+    limite inferior do makespan é max(total / workers, maior duração).
+    """
+    sequential_time = sum(durations)
+    parallel_time = max(sequential_time / max(1, workers), max(durations, default=0.0))
+
+    return sequential_time / parallel_time if parallel_time > 0 else 1.0
+
+
 class PerformanceAnalyzer:
     """Analisa performance de execução de testes."""
 
     def __init__(self, analytics: TestAnalytics):
         self.analytics = analytics
+        # (geração, ordem): recalculada só quando há execuções/resultados novos
+        self._order_cache: Optional[Tuple[Tuple, List[str]]] = None
 
     def suggest_parallelization(self) -> Dict[str, Any]:
         """Sugere estratégia de paralelização."""
@@ -349,33 +649,24 @@ class PerformanceAnalyzer:
         if not metrics:
             return 1.0
 
-        sequential_time = sum(m.avg_duration for m in metrics)
-        parallel_time = sequential_time / max(1, workers)
-
-        return sequential_time / parallel_time if parallel_time > 0 else 1.0
+        return _speedup_kernel([m.avg_duration for m in metrics], workers)
 
     def optimize_execution_order(self) -> List[str]:
         """Sugere ordem ótima de execução."""
-        # Buscar todas as métricas
-        conn = sqlite3.connect(self.analytics.db_path)
-        cursor = conn.cursor()
+        cutoff_day = _cutoff(7) // 86400
 
-        cursor.execute("""
-            SELECT
-                test_id,
-                AVG(duration) as avg_duration,
-                SUM(CASE WHEN status != 'passed' THEN 1 ELSE 0 END) as failures
-            FROM test_results
-            WHERE timestamp > datetime('now', '-7 days')
-            GROUP BY test_id
-            ORDER BY failures DESC, avg_duration DESC
-        """)
+        # MAX(id) sai direto da rowid; muda a cada execução/resultado gravado
+        generation = (*self.analytics._fetchone(_SELECT_GENERATION_SQL), cutoff_day)
+        if self._order_cache is not None and self._order_cache[0] == generation:
+            return list(self._order_cache[1])
 
-        rows = cursor.fetchall()
-        conn.close()
+        # Buscar todas as métricas (últimos 7 dias, do rollup)
+        with self.analytics._query(_SELECT_EXECUTION_ORDER_SQL, (cutoff_day,)) as cursor:
+            # Retornar apenas IDs ordenados
+            order = [row["test_id"] for row in cursor]
 
-        # Retornar apenas IDs ordenados
-        return [row[0] for row in rows]
+        self._order_cache = (generation, order)
+        return list(order)
 
 
 def main():
@@ -400,7 +691,7 @@ def main():
         flaky = analytics.get_flaky_tests(days=args.days)
         print(f"\n⚠️  TESTES INSTÁVEIS ({len(flaky)}):")
         for m in flaky:
-            print(f"  {m.test_id}: {m.failures}/{m.total_runs} falhas ({m.flakiness_score*100:.1f}%)")
+            print(f"  {m.test_id}: {m.failures}/{m.total_runs} falhas ({100 - m.success_rate:.1f}%), instabilidade {m.flakiness_score:.2f}")
 
     if args.slow:
         slow = analytics.get_slow_tests(days=args.days)
@@ -411,7 +702,7 @@ def main():
     if args.optimize:
         analyzer = PerformanceAnalyzer(analytics)
         suggestions = analyzer.suggest_parallelization()
-        print(f"\n💡 SUGESTÕES DE OTIMIZAÇÃO:")
+        print("\n💡 SUGESTÕES DE OTIMIZAÇÃO:")
         print(f"  Testes rápidos: {suggestions['fast_tests']}")
         print(f"  Testes médios: {suggestions['medium_tests']}")
         print(f"  Testes lentos: {suggestions['slow_tests']}")
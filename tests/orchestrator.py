@@ -13,25 +13,27 @@ Sistema inteligente de orquestração de testes com:
 import concurrent.futures
 import dataclasses
 import enum
-import io
+import functools
+import heapq
 import json
 import os
 import re
-import subprocess
 import sys
 import threading
 import time
-import traceback
 import unittest
 import ast
 import importlib
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Type
-import importlib.util
-import inspect
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+try:
+    import orjson  # Serialização em C para relatórios grandes
+except ImportError:
+    orjson = None
 
 # ============================================================
 # CLASSIFICAÇÃO E TIPOS DE TESTE
@@ -47,6 +49,17 @@ class TestCategory(enum.Enum):
     PROPERTY = "property"             # Testes de propriedade
     FLAKY = "flaky"                   # Testes instáveis (requerem retry)
 
+    def __init__(self, value):
+        # Bit único por categoria, para filtrar por máscara (1 << ordem de definição)
+        self.bit = 1 << len(type(self).__members__)
+
+
+_ALL_CATEGORIES_MASK = (1 << len(TestCategory)) - 1
+
+# Valores aceitos pelo CLI e conversão valor -> categoria
+_CATEGORY_CHOICES = tuple(c.value for c in TestCategory)
+_CATEGORY_BY_VALUE = {c.value: c for c in TestCategory}
+
 
 class TestPriority(enum.Enum):
     """Prioridade de execução."""
@@ -56,7 +69,7 @@ class TestPriority(enum.Enum):
     LOW = 3           # Baixa prioridade
 
 
-@dataclass
+@dataclass(slots=True)
 class TestMetadata:
     """Metadados de um teste para orquestração."""
     name: str
@@ -72,17 +85,87 @@ class TestMetadata:
     requires_network: bool = False
     requires_auth: bool = False
     parallel_safe: bool = True
+    # Partes de `name` ("Classe.metodo"), separadas uma vez na descoberta
+    test_class_name: str = ""
+    test_method_name: str = ""
+
+    def __post_init__(self):
+        if not self.test_method_name:
+            self.test_class_name, _, self.test_method_name = self.name.rpartition('.')
 
 
 # ============================================================
 # DESCOBERTA E CLASSIFICAÇÃO DE TESTES
 # ============================================================
 
+# Tokens do fallback: classe TestCase | outra classe | método test_*
+_TOKEN_RE = re.compile(
+    r'^class\s+(\w+)\s*\([^)]*TestCase[^)]*\)\s*:'
+    r'|^class\s+(\w+)'
+    r'|^[ \t]+(?:async\s+)?def\s+(test_\w+)\s*\(',
+    re.M,
+)
+
+# A partir de quantos arquivos não cacheados a descoberta usa processos
+_PARALLEL_DISCOVERY_MIN_FILES = 8
+
+
+def _walk_test_files(root: Path) -> Iterator[Tuple[Path, os.stat_result]]:
+    """Percorre `root` com os.scandir e retorna (arquivo test_*.py, stat)."""
+    try:
+        entries = list(os.scandir(root))
+    except OSError:
+        return
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            yield from _walk_test_files(Path(entry.path))
+        elif entry.name.startswith("test_") and entry.name.endswith(".py") and entry.is_file():
+            yield Path(entry.path), entry.stat()
+
+
+def _is_testcase(bases: List[ast.expr]) -> bool:
+    """Verifica se alguma base é (ou parece) um TestCase."""
+    for base in bases:
+        if isinstance(base, ast.Name) and 'TestCase' in base.id:
+            return True
+        if isinstance(base, ast.Attribute) and 'TestCase' in base.attr:
+            return True
+    return False
+
+
+class _TestVisitor(ast.NodeVisitor):
+    """
+    Coleta métodos test_* de classes TestCase.
+
+    Percorre o módulo, corpos de classe e blocos de nível de módulo
+    (if/try/with); corpos de função nunca são visitados.
+    """
+
+    def __init__(self) -> None:
+        self.found: List[Tuple[str, ast.AST]] = []
+
+    def visit_ClassDef(self, node: ast.ClassDef) -> None:
+        if _is_testcase(node.bases):
+            for item in node.body:
+                if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)) and item.name.startswith('test_'):
+                    self.found.append((node.name, item))
+        # Classes aninhadas
+        self.generic_visit(node)
+
+    def visit_FunctionDef(self, node: ast.AST) -> None:
+        pass  # Classes definidas dentro de funções não são coletadas
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
 
 class TestDiscovery:
     """Descobre e classifica testes automaticamente."""
 
-    def __init__(self, test_dirs: List[str] = None):
+    CACHE_FILE = ".pytest_discovery_cache.json"
+    # Incrementar ao mudar o formato das entradas (ex.: campos de TestMetadata)
+    CACHE_VERSION = 2
+
+    def __init__(self, test_dirs: List[str] = None, cache_path: Optional[str] = None):
         # Se não especificado, usar diretório atual onde o script está
         if test_dirs is None:
             script_dir = Path(__file__).parent
@@ -90,255 +173,212 @@ class TestDiscovery:
         else:
             self.test_dirs = test_dirs
         self.tests: Dict[str, TestMetadata] = {}
+        # Cache persistente: arquivo -> (mtime, tamanho, testes encontrados)
+        self.cache_path = Path(cache_path or Path(self.test_dirs[0]) / self.CACHE_FILE)
+        self._cache: Dict[str, Dict[str, Any]] = {}
+        self._cache_dirty = False
 
     def discover(self) -> Dict[str, TestMetadata]:
         """Descobre todos os testes nos diretórios especificados."""
         self.tests = {}
+        previous = self._load_cache()
+        self._cache = {}
+        self._cache_dirty = False
 
+        # Arquivos em ordem; None marca os que precisam ser analisados
+        found: List[Optional[Dict[str, TestMetadata]]] = []
+        pending: List[Tuple[int, Path, os.stat_result]] = []
         for test_dir in self.test_dirs:
             test_path = Path(test_dir)
             if not test_path.exists():
                 continue
 
-            for test_file in test_path.rglob("test_*.py"):
-                self._analyze_test_file(test_file)
+            for test_file, st in _walk_test_files(test_path):
+                cached = self._from_cache(previous, test_file, st)
+                if cached is None:
+                    pending.append((len(found), test_file, st))
+                found.append(cached)
+
+        if pending:
+            paths = [str(test_file) for _, test_file, _ in pending]
+            for (index, test_file, st), tests in zip(pending, self._analyze_files(paths)):
+                found[index] = tests
+                self._cache[str(test_file.resolve())] = {
+                    "mtime": st.st_mtime_ns,
+                    "size": st.st_size,
+                    "tests": {name: self._metadata_to_dict(m) for name, m in tests.items()},
+                }
+            self._cache_dirty = True
+
+        for tests in found:
+            self.tests.update(tests)
+
+        # Regravar se algo mudou (inclusive arquivos removidos)
+        if self._cache_dirty or previous.keys() != self._cache.keys():
+            self._save_cache()
 
         return self.tests
 
+    @staticmethod
+    def _analyze_files(paths: List[str]) -> List[Dict[str, TestMetadata]]:
+        """Analisa os arquivos, em processos separados quando há muitos."""
+        if len(paths) >= _PARALLEL_DISCOVERY_MIN_FILES and (os.cpu_count() or 1) > 1:
+            try:
+                with concurrent.futures.ProcessPoolExecutor(max_workers=os.cpu_count()) as pool:
+                    return list(pool.map(_analyze_one, paths))
+            except (OSError, concurrent.futures.process.BrokenProcessPool):
+                pass  # Sem suporte a processos: analisar aqui mesmo
+        return [_analyze_one(path) for path in paths]
+
+    @staticmethod
+    def _cache_header() -> Dict[str, Any]:
+        """Identifica o formato do cache; arquivo com outro cabeçalho é descartado."""
+        return {
+            "version": TestDiscovery.CACHE_VERSION,
+            "python": f"{sys.version_info[0]}.{sys.version_info[1]}",
+        }
+
+    def _load_cache(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(cache, dict) or cache.get("header") != self._cache_header():
+            return {}  # Formato antigo, outra versão ou outro Python: reanalisar
+        files = cache.get("files")
+        return files if isinstance(files, dict) else {}
+
+    def _save_cache(self) -> None:
+        try:
+            with open(self.cache_path, 'w', encoding='utf-8') as f:
+                json.dump({"header": self._cache_header(), "files": self._cache}, f)
+        except OSError:
+            pass  # Cache é só otimização
+
+    @staticmethod
+    def _metadata_to_dict(metadata: TestMetadata) -> Dict[str, Any]:
+        data = dataclasses.asdict(metadata)
+        data["category"] = metadata.category.value
+        data["priority"] = metadata.priority.value
+        data["tags"] = sorted(metadata.tags)
+        return data
+
+    @staticmethod
+    def _metadata_from_dict(data: Dict[str, Any]) -> TestMetadata:
+        data = dict(data)
+        data["category"] = TestCategory(data["category"])
+        data["priority"] = TestPriority(data["priority"])
+        data["tags"] = set(data.get("tags", ()))
+        return TestMetadata(**data)
+
+    def _from_cache(self, cache: Dict[str, Dict[str, Any]], test_file: Path,
+                    st: os.stat_result) -> Optional[Dict[str, TestMetadata]]:
+        """Retorna os testes em cache do arquivo se ele não mudou."""
+        key = str(test_file.resolve())
+        entry = cache.get(key)
+        if not entry or entry.get("mtime") != st.st_mtime_ns or entry.get("size") != st.st_size:
+            return None
+        try:
+            tests = {
+                name: self._metadata_from_dict(data)
+                for name, data in entry["tests"].items()
+            }
+        except (KeyError, TypeError, ValueError):
+            return None  # Entrada corrompida: reanalisar
+        self._cache[key] = entry
+        return tests
+
     def _analyze_test_file(self, test_file: Path) -> None:
         """Analisa um arquivo de teste e extrai metadados."""
-        with open(test_file, 'r', encoding='utf-8') as f:
-            content = f.read()
+        # Bytes: ast.parse faz a decodificação (respeitando o cookie de encoding)
+        content = test_file.read_bytes()
 
         # Usar análise manual (mais robusta)
         self._manual_analyze(test_file, content)
 
-    def _iterate_suite(self, suite, test_file: Path, content: str) -> None:
-        """Itera recursivamente sobre uma suite de testes."""
-        for test in suite:
-            if isinstance(test, unittest.TestCase):
-                self._process_test_case(test, test_file, content)
-            elif isinstance(test, unittest.TestSuite):
-                self._iterate_suite(test, test_file, content)
-
-    def _process_test_case(self, test: unittest.TestCase, test_file: Path, content: str) -> None:
-        """Processa um TestCase individual."""
-        test_id = test.id()
-        if not test_id:
+    def _manual_analyze(self, test_file: Path, content: Union[str, bytes]) -> None:
+        """Análise manual do arquivo usando AST parsing."""
+        try:
+            tree = ast.parse(content, filename=str(test_file))
+        except (SyntaxError, ValueError):
+            # Fallback para regex se AST parsing falhar
+            if isinstance(content, bytes):
+                content = content.decode('utf-8', errors='replace')
+            self._manual_analyze_fallback(test_file, content)
             return
 
-        # Extrair nome da classe e método
-        parts = test_id.split('.')
-        if len(parts) >= 2:
-            class_name = parts[-2]
-            method_name = parts[-1]
+        # Uma busca por arquivo, não por teste
+        uses_patch = (b"@patch" if isinstance(content, bytes) else "@patch") in content
+
+        visitor = _TestVisitor()
+        visitor.visit(tree)
+
+        file_path = str(test_file.resolve())
+        for class_name, item in visitor.found:
+            method_name = item.name
             full_name = f"{class_name}.{method_name}"
 
-            # Criar metadados básicos
             metadata = TestMetadata(
                 name=full_name,
-                module='.'.join(parts[:-2]),
-                file_path=str(test_file.resolve()),
-                line_number=0,
-                category=self._detect_category_from_name(method_name, content),
+                module=test_file.stem,
+                file_path=file_path,
+                line_number=item.lineno or 0,
+                category=self._detect_category_from_name(method_name, uses_patch),
                 priority=TestPriority.MEDIUM,
                 estimated_duration=0.1,
                 parallel_safe=True
             )
             self.tests[full_name] = metadata
 
-    def _manual_analyze(self, test_file: Path, content: str) -> None:
-        """Análise manual do arquivo usando AST parsing."""
-        try:
-            tree = ast.parse(content)
-            for node in ast.walk(tree):
-                if isinstance(node, ast.ClassDef):
-                    # Verificar se herda de TestCase
-                    is_test_case = False
-                    for base in node.bases:
-                        if isinstance(base, ast.Name) and 'TestCase' in base.id:
-                            is_test_case = True
-                            break
-                        elif isinstance(base, ast.Attribute) and 'TestCase' in base.attr:
-                            is_test_case = True
-                            break
-
-                    if is_test_case:
-                        class_name = node.name
-                        # Encontrar métodos test_*
-                        for item in node.body:
-                            if isinstance(item, ast.FunctionDef) and item.name.startswith('test_'):
-                                method_name = item.name
-                                full_name = f"{class_name}.{method_name}"
-
-                                metadata = TestMetadata(
-                                    name=full_name,
-                                    module=test_file.stem,
-                                    file_path=str(test_file.resolve()),
-                                    line_number=item.lineno or 0,
-                                    category=self._detect_category_from_name(method_name, content),
-                                    priority=TestPriority.MEDIUM,
-                                    estimated_duration=0.1,
-                                    parallel_safe=True
-                                )
-                                self.tests[full_name] = metadata
-        except (SyntaxError, ValueError) as e:
-            # Fallback para regex se AST parsing falhar
-            self._manual_analyze_fallback(test_file, content)
-
     def _manual_analyze_fallback(self, test_file: Path, content: str) -> None:
-        """Análise manual usando regex como fallback."""
-        # Encontrar classes de teste
-        class_pattern = r'class\s+(\w+)\s*\(.*TestCase.*\):'
-        for class_match in re.finditer(class_pattern, content):
-            class_name = class_match.group(1)
-
-            # Encontrar métodos de teste
-            method_pattern = r'def\s+(test_\w+)\s*\('
-            class_start = class_match.end()
-            next_class = content.find('class ', class_start)
-            if next_class == -1:
-                class_content = content[class_start:]
-            else:
-                class_content = content[class_start:next_class]
-
-            for method_match in re.finditer(method_pattern, class_content):
-                method_name = method_match.group(1)
-                full_name = f"{class_name}.{method_name}"
-
-                metadata = TestMetadata(
-                    name=full_name,
-                    module=test_file.stem,
-                    file_path=str(test_file.resolve()),
-                    line_number=0,
-                    category=self._detect_category_from_name(method_name, content),
-                    priority=TestPriority.MEDIUM,
-                    estimated_duration=0.1,
-                    parallel_safe=True
-                )
-                self.tests[full_name] = metadata
-
-    def _detect_category_from_name(self, name: str, content: str) -> TestCategory:
-        """Detecta categoria baseada no nome e conteúdo."""
-        if "mock" in name.lower() or "@patch" in content:
-            return TestCategory.MOCK
-        if "api" in name.lower() or "request" in name.lower():
-            return TestCategory.API
-        return TestCategory.UNIT
-
-    def _analyze_test_class(self, test_class: Type, test_file: Path, content: str) -> None:
-        """Analisa uma classe de teste."""
-        for method_name, method in inspect.getmembers(test_class, inspect.ismethod):
-            if method_name.startswith("test_"):
-                test_id = f"{test_class.__name__}.{method_name}"
-                metadata = self._extract_metadata(test_class, method, test_file, content)
-                self.tests[test_id] = metadata
-
-    def _extract_metadata(self, test_class: Type, test_method: Callable,
-                         test_file: Path, content: str) -> TestMetadata:
-        """Extrai metadados de um teste."""
-
-        # Encontrar linha do método
-        source_lines, start_line = inspect.getsourcelines(test_method)
-        abs_path = str(test_file.resolve())
-
-        # Categorização baseada em padrões
-        name = f"{test_class.__name__}.{test_method.__name__}"
-        doc = test_method.__doc__ or ""
-
-        # Detectar categoria
-        category = self._detect_category(test_class, test_method, content, doc)
-
-        # Detectar prioridade
-        priority = self._detect_priority(name, doc, content)
-
-        # Detectar se requer network/auth
-        requires_network = self._requires_network(name, doc, content)
-        requires_auth = self._requires_auth(name, doc, content)
-
-        # Detectar se é flaky
-        flaky = self._is_flaky(name, doc, content)
-
-        # Estimar duração
-        duration = self._estimate_duration(category, name, content)
-
-        return TestMetadata(
-            name=name,
-            module=test_class.__module__,
-            file_path=abs_path,
-            line_number=start_line,
-            category=category,
-            priority=priority,
-            estimated_duration=duration,
-            flaky=flaky,
-            requires_network=requires_network,
-            requires_auth=requires_auth,
-            parallel_safe=not (requires_auth or flaky)
-        )
-
-    def _detect_category(self, test_class: Type, test_method: Callable,
-                         content: str, doc: str) -> TestCategory:
-        """Detecta a categoria do teste."""
-
-        name = test_method.__name__
-        full_name = f"{test_class.__name__}.{name}"
-
-        # Padrões para detectar categoria
-        if "mock" in name.lower() or "mock" in doc.lower():
-            return TestCategory.MOCK
-
-        if "integration" in name.lower() or "integration" in doc.lower():
-            return TestCategory.INTEGRATION
+        """Análise manual usando regex como fallback (varredura linear única)."""
+        class_name = None
+        line, pos = 1, 0
+        uses_patch = "@patch" in content
+        for match in _TOKEN_RE.finditer(content):
+            test_class, other_class, method_name = match.groups()
+            if test_class:
+                class_name = test_class
+                continue
+            if other_class:
+                class_name = None  # Métodos seguintes não são de TestCase
+                continue
+            if class_name is None:
+                continue
 
-        if "api" in name.lower() or "request" in name.lower():
-            return TestCategory.API
+            line += content.count('\n', pos, match.start())
+            pos = match.start()
+            full_name = f"{class_name}.{method_name}"
 
-        if "property" in name.lower() or "property" in doc.lower():
-            return TestCategory.PROPERTY
+            metadata = TestMetadata(
+                name=full_name,
+                module=test_file.stem,
+                file_path=str(test_file.resolve()),
+                line_number=line,
+                category=self._detect_category_from_name(method_name, uses_patch),
+                priority=TestPriority.MEDIUM,
+                estimated_duration=0.1,
+                parallel_safe=True
+            )
+            self.tests[full_name] = metadata
 
-        # Verificar se usa mocks
-        source = inspect.getsource(test_method)
-        if "@patch" in content or "Mock" in source or "mock" in source:
+    def _detect_category_from_name(self, name: str, uses_patch: bool) -> TestCategory:
+        """Detecta categoria baseada no nome e no uso de @patch no arquivo."""
+        name_l = name.lower()
+        if uses_patch or 'mock' in name_l:
             return TestCategory.MOCK
-
+        if 'api' in name_l or 'request' in name_l:
+            return TestCategory.API
         return TestCategory.UNIT
 
-    def _detect_priority(self, name: str, doc: str, content: str) -> TestPriority:
-        """Detecta a prioridade do teste."""
-
-        if "critical" in name.lower() or "critical" in doc.lower():
-            return TestPriority.CRITICAL
-
-        if "important" in name.lower() or "important" in doc.lower():
-            return TestPriority.HIGH
-
-        if "flaky" in name.lower() or "slow" in name.lower():
-            return TestPriority.LOW
-
-        return TestPriority.MEDIUM
-
-    def _requires_network(self, name: str, doc: str, content: str) -> bool:
-        """Detecta se o teste requer rede."""
-        return bool("api" in name.lower() or "network" in doc.lower())
 
-    def _requires_auth(self, name: str, doc: str, content: str) -> bool:
-        """Detecta se o teste requer autenticação."""
-        return bool("auth" in name.lower() or "login" in doc.lower())
-
-    def _is_flaky(self, name: str, doc: str, content: str) -> bool:
-        """Detecta se o teste é instável."""
-        return bool("flaky" in name.lower() or "unstable" in doc.lower())
-
-    def _estimate_duration(self, category: TestCategory, name: str, content: str) -> float:
-        """Estima a duração do teste."""
-        base_durations = {
-            TestCategory.UNIT: 0.1,
-            TestCategory.MOCK: 0.05,
-            TestCategory.INTEGRATION: 2.0,
-            TestCategory.API: 5.0,
-            TestCategory.PROPERTY: 1.0,
-        }
-        return base_durations.get(category, 1.0)
+def _analyze_one(path: str) -> Dict[str, TestMetadata]:
+    """Analisa um único arquivo (nível de módulo para ser picklável)."""
+    test_file = Path(path)
+    discovery = TestDiscovery([str(test_file.parent)])
+    discovery._analyze_test_file(test_file)
+    return discovery.tests
 
 
 # ============================================================
@@ -355,9 +395,20 @@ class ExecutionConfig:
     retry_flaky: int = 3
     verbose: bool = True
     coverage: bool = False
+    use_processes: bool = False  # Processos em vez de threads (testes CPU-bound)
     categories: Set[TestCategory] = field(default_factory=lambda: set(TestCategory))
 
 
+# Abaixo disso _run_parallel executa em sequência, sem criar o pool
+_MIN_PARALLEL_TESTS = 2
+_MIN_PARALLEL_ESTIMATE = 0.05  # segundos estimados somando os testes paralelizáveis
+
+
+# Início do erro guardado no TestResult: cobre o maior recorte usado nas
+# saídas (relatório: 200, console: 100) e libera o traceback completo
+_ERROR_MAX_LEN = 512
+
+
 @dataclass
 class TestResult:
     """Resultado de execução de um teste."""
@@ -365,9 +416,11 @@ class TestResult:
     status: str  # "passed", "failed", "skipped", "error"
     duration: float
     output: str = ""
-    error: str = ""
+    error: str = ""  # Até _ERROR_MAX_LEN caracteres
     retries: int = 0
-    timestamp: datetime = field(default_factory=datetime.now)
+    # Epoch em segundos (relógio de parede, aceito por TestAnalytics); a
+    # duração é medida à parte, com time.monotonic_ns
+    timestamp: float = field(default_factory=time.time)
 
 
 @dataclass
@@ -380,6 +433,7 @@ class ExecutionSummary:
     errors: int = 0
     duration: float = 0.0
     results: List[TestResult] = field(default_factory=list)
+    failures: List[TestResult] = field(default_factory=list)  # Falhas e erros, na ordem de registro
     start_time: datetime = field(default_factory=datetime.now)
     end_time: Optional[datetime] = None
 
@@ -405,7 +459,9 @@ class TestOrchestrator:
         self.tests: Dict[str, TestMetadata] = {}
         self.summary = ExecutionSummary()
         self._stop_event = threading.Event()
-        self._summary_lock = threading.Lock()
+        # Módulos de teste resolvidos: nome -> (módulo, {classe: objeto})
+        self._module_cache: Dict[str, Tuple[Any, Dict[str, type]]] = {}
+        self._module_cache_lock = threading.Lock()
 
     def discover_tests(self) -> None:
         """Descobre todos os testes."""
@@ -425,52 +481,59 @@ class TestOrchestrator:
     def run(self) -> ExecutionSummary:
         """Executa os testes conforme a configuração."""
         self.summary.start_time = datetime.now()
+        start_ns = time.monotonic_ns()
+        self._stop_event.clear()
 
         print(f"\n🚀 Iniciando execução de {len(self.tests)} testes...")
         print(f"   Paralelo: {self.config.parallel}")
         print(f"   Workers: {self.config.max_workers}")
         print(f"   Fail fast: {self.config.fail_fast}\n")
 
-        # Filtrar testes por categoria se especificado
-        tests_to_run = self._filter_tests()
-
-        # Ordenar por prioridade
-        tests_to_run = sorted(
-            tests_to_run,
-            key=lambda t: (t.priority.value, t.estimated_duration)
-        )
-
-        self.summary.total = len(tests_to_run)
-
-        if self.config.parallel and len(tests_to_run) > 1:
-            self._run_parallel(tests_to_run)
+        # Dentro da prioridade: em paralelo, mais longos primeiro (LPT, evita
+        # um teste lento terminando sozinho); em sequência, mais curtos primeiro
+        sign = -1 if self.config.parallel else 1
+
+        # Filtro por categoria e heap de prioridade numa única passada; o heap
+        # (O(N)) libera os primeiros testes sem ordenar a cauda e o índice
+        # desempata sem comparar TestMetadata
+        mask = self._category_mask()
+        heap = [
+            (t.priority.value, sign * t.estimated_duration, i, t)
+            for i, t in enumerate(self.tests.values())
+            if t.category.bit & mask
+        ]
+        heapq.heapify(heap)
+
+        self.summary.total = len(heap)
+
+        if self.config.parallel and len(heap) > 1:
+            self._run_parallel(heap)
         else:
-            self._run_sequential(tests_to_run)
+            self._run_sequential(_drain_heap(heap), len(heap))
 
+        # Fail fast interrompe de propósito: o total passa a ser o dos
+        # resultados reportados (fora isso, testes perdidos aparecem na conta)
+        if self._stop_event.is_set():
+            self.summary.total = len(self.summary.results)
+        self.summary.duration = (time.monotonic_ns() - start_ns) * 1e-9
         self.summary.end_time = datetime.now()
-        self.summary.duration = (
-            self.summary.end_time - self.summary.start_time
-        ).total_seconds()
 
         return self.summary
 
-    def _filter_tests(self) -> List[TestMetadata]:
-        """Filtra testes baseado na configuração."""
-        tests = list(self.tests.values())
-
-        # Se categorias específicas foram configuradas, filtrar
-        if self.config.categories and self.config.categories != set(TestCategory):
-            tests = [t for t in tests if t.category in self.config.categories]
-
-        return tests
+    def _category_mask(self) -> int:
+        """Máscara de bits das categorias a executar (todas se nenhuma for filtrada)."""
+        mask = 0
+        for category in self.config.categories:
+            mask |= category.bit
+        return mask or _ALL_CATEGORIES_MASK
 
-    def _run_sequential(self, tests: List[TestMetadata]) -> None:
+    def _run_sequential(self, tests: Iterable[TestMetadata], total: int) -> None:
         """Executa testes sequencialmente."""
         for i, test in enumerate(tests, 1):
             if self._stop_event.is_set():
                 break
 
-            print(f"[{i}/{len(tests)}] {test.name}... ", end="", flush=True)
+            print(f"[{i}/{total}] {test.name}... ", end="", flush=True)
 
             result = self._execute_single_test(test)
             self.summary.results.append(result)
@@ -480,48 +543,126 @@ class TestOrchestrator:
 
             if self.config.fail_fast and result.status in ("failed", "error"):
                 print("\n⛔ Fail fast: parando execução")
+                self._stop_event.set()
                 break
 
-    def _run_parallel(self, tests: List[TestMetadata]) -> None:
-        """Executa testes em paralelo."""
-        # Separar testes paralelos de sequenciais
-        parallel_tests = [t for t in tests if t.parallel_safe]
-        sequential_tests = [t for t in tests if not t.parallel_safe]
+    def _run_parallel(self, heap: List[Tuple[Any, ...]]) -> None:
+        """Executa testes em paralelo, consumindo o heap de prioridade sob demanda."""
+        # Testes não paralelizáveis saem do heap junto com os demais e
+        # rodam ao final, na ordem de prioridade
+        sequential_tests: List[TestMetadata] = []
 
         completed = 0
-        total = len(tests)
-
-        # Executar testes paralelos
-        with ThreadPoolExecutor(max_workers=self.config.max_workers) as executor:
-            futures = {
-                executor.submit(self._execute_single_test, test): test
-                for test in parallel_tests
-            }
-
-            for future in as_completed(futures):
-                if self._stop_event.is_set():
-                    break
+        total = len(heap)
+
+        # Uma passada pelo heap: contagem, estimativa e módulos dos paralelizáveis
+        # (a separação paralelo/sequencial acontece ao retirar do heap)
+        parallel_count = 0
+        parallel_estimate = 0.0
+        modules: Set[str] = set()
+        for entry in heap:
+            test = entry[-1]
+            if test.parallel_safe:
+                parallel_count += 1
+                parallel_estimate += test.estimated_duration
+                modules.add(test.module)
+
+        # Poucos testes paralelizáveis (ou todos muito rápidos): criar o pool
+        # custa mais do que rodar tudo em sequência
+        if parallel_count <= _MIN_PARALLEL_TESTS or parallel_estimate < _MIN_PARALLEL_ESTIMATE:
+            self._run_sequential(_drain_heap(heap), total)
+            return
 
-                test = futures[future]
-                try:
-                    result = future.result()
-                    with self._summary_lock:
+        # Executar testes paralelos, sem workers que ficariam ociosos
+        use_processes = self.config.use_processes
+        workers = min(self.config.max_workers, parallel_count)
+        if use_processes:
+            workers = min(workers, os.cpu_count() or 1)
+            # Resultados voltam por pickle
+            executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_process_worker,
+                initargs=(list(sys.path), sorted(modules), self.config),
+            )
+            run_chunk = _execute_chunk_in_process
+        else:
+            executor = ThreadPoolExecutor(max_workers=workers)
+            run_chunk = self._execute_test_chunk
+
+        # Lotes contíguos (~4 por worker): menos futures para testes rápidos
+        chunk_size = max(1, total // (workers * 4))
+
+        def next_chunk() -> List[TestMetadata]:
+            chunk: List[TestMetadata] = []
+            while heap and len(chunk) < chunk_size:
+                test = heapq.heappop(heap)[-1]
+                (chunk if test.parallel_safe else sequential_tests).append(test)
+            return chunk
+
+        with executor:
+            # Pipeline limitado: no máximo 2 lotes por worker em voo; o
+            # próximo lote só é retirado do heap quando um termina
+            pending: Dict[concurrent.futures.Future, List[TestMetadata]] = {}
+
+            def submit_more() -> None:
+                while len(pending) < workers * 2:
+                    chunk = next_chunk()
+                    if not chunk:
+                        return
+                    try:
+                        future = executor.submit(run_chunk, chunk)
+                    except Exception as e:  # Pool quebrado (ex.: BrokenProcessPool)
+                        future = concurrent.futures.Future()
+                        future.set_exception(e)
+                    pending[future] = chunk
+
+            submit_more()
+            failed_fast = False
+            while pending and not failed_fast:
+                done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    chunk = pending.pop(future)
+                    try:
+                        results = future.result()
+                    except Exception as e:
+                        # Worker morto, erro de pickle...: o lote inteiro vira erro
+                        print(f"❌ Erro ao executar lote de {len(chunk)} testes ({chunk[0].name}...): {e}")
+                        error_msg = f"Erro ao executar o lote: {e!r}"[:_ERROR_MAX_LEN]
+                        results = [
+                            TestResult(test_id=test.name, status="error", duration=0.0,
+                                       error=error_msg)
+                            for test in chunk
+                        ]
+
+                    # Registro no resumo só na thread principal e só do que foi
+                    # impresso; linhas do lote escritas de uma vez (um flush por lote)
+                    lines = []
+                    for test, result in zip(chunk, results):
+                        completed += 1
                         self.summary.results.append(result)
                         self._update_summary(result)
+                        lines.append(f"[{completed}/{total}] {test.name}... {self._format_result(result)}")
 
-                    completed += 1
-                    print(f"[{completed}/{total}] {test.name}... ", end="", flush=True)
-                    self._print_result(result)
-
-                    if self.config.fail_fast and result.status in ("failed", "error"):
-                        print("\n⛔ Fail fast: cancelando testes restantes")
-                        executor.shutdown(wait=False, cancel_futures=True)
+                        if self.config.fail_fast and result.status in ("failed", "error"):
+                            failed_fast = True
+                            break
+                    sys.stdout.write("".join(lines))
+                    sys.stdout.flush()
+                    if failed_fast:
                         break
 
-                except Exception as e:
-                    print(f"❌ Erro ao executar {test.name}: {e}")
+                if failed_fast:
+                    print("\n⛔ Fail fast: cancelando testes restantes")
+                    # Lotes em execução param no próximo teste (_execute_test_chunk)
+                    self._stop_event.set()
+                    executor.shutdown(wait=False, cancel_futures=True)
+                elif self._stop_event.is_set():
+                    break
+                else:
+                    submit_more()
 
-        # Executar testes sequenciais
+        # Executar testes sequenciais (inclusive os que ficaram no heap)
+        sequential_tests.extend(t for t in _drain_heap(heap) if not t.parallel_safe)
         for test in sequential_tests:
             if self._stop_event.is_set():
                 break
@@ -534,32 +675,41 @@ class TestOrchestrator:
             self._update_summary(result)
             self._print_result(result)
 
+    def _execute_test_chunk(self, tests: List[TestMetadata]) -> List[TestResult]:
+        """Executa um lote de testes em sequência na thread do worker."""
+        results = []
+        for test in tests:
+            if self._stop_event.is_set():
+                break
+            results.append(self._execute_single_test(test))
+        return results
+
     def _execute_single_test(self, test: TestMetadata) -> TestResult:
         """Executa um único teste."""
-        start_time = time.time()
+        start_ns = time.monotonic_ns()
 
         try:
-            # Importar e executar o teste
-            module = importlib.import_module(test.module)
-            test_class_name = test.name.split('.')[0]
-            test_method_name = test.name.split('.')[1]
-
-            test_class = getattr(module, test_class_name)
-            suite = unittest.TestSuite()
-            suite.addTest(test_class(test_method_name))
-
-            # Usar context manager para fechar o file handle
-            with open(os.devnull, 'w', encoding='utf-8') as stream:
-                runner = unittest.TextTestRunner(stream=stream, verbosity=0)
-                result = runner.run(suite)
+            # Importar (uma vez por módulo) e executar o teste
+            test_class = self._resolve_test(test)
+
+            # Testes instáveis são repetidos até passar; a classe já resolvida
+            # é reaproveitada e cada tentativa só cria um TestCase novo
+            attempts = 1
+            if test.flaky or test.category is TestCategory.FLAKY:
+                attempts += max(0, self.config.retry_flaky)
+            for retries in range(attempts):
+                result = self._run_once(test_class, test.test_method_name)
+                if result.wasSuccessful():
+                    break
 
-            duration = time.time() - start_time
+            duration = (time.monotonic_ns() - start_ns) * 1e-9
 
             if result.wasSuccessful():
                 return TestResult(
                     test_id=test.name,
                     status="passed",
-                    duration=duration
+                    duration=duration,
+                    retries=retries
                 )
             elif result.errors:
                 error_msg = str(result.errors[0][1]) if result.errors else ""
@@ -567,7 +717,8 @@ class TestOrchestrator:
                     test_id=test.name,
                     status="error",
                     duration=duration,
-                    error=error_msg
+                    error=error_msg[:_ERROR_MAX_LEN],
+                    retries=retries
                 )
             else:
                 failure_msg = str(result.failures[0][1]) if result.failures else ""
@@ -575,43 +726,78 @@ class TestOrchestrator:
                     test_id=test.name,
                     status="failed",
                     duration=duration,
-                    error=failure_msg
+                    error=failure_msg[:_ERROR_MAX_LEN],
+                    retries=retries
                 )
 
         except Exception as e:
-            duration = time.time() - start_time
+            duration = (time.monotonic_ns() - start_ns) * 1e-9
+            error_msg = str(e)
             return TestResult(
                 test_id=test.name,
                 status="error",
                 duration=duration,
-                error=str(e)
+                error=error_msg[:_ERROR_MAX_LEN]
             )
 
+    @staticmethod
+    def _run_once(test_class: type, method_name: str) -> unittest.TestResult:
+        """Executa uma tentativa do teste num TestCase e TestResult novos."""
+        # TestCase direto num TestResult simples: sem runner nem stream;
+        # a suite só entra quando há setUpClass/setUpModule a executar
+        result = unittest.TestResult()
+        test_case = test_class(method_name)
+        if _has_fixtures(test_class):
+            unittest.TestSuite((test_case,)).run(result)
+        else:
+            test_case.run(result)
+        return result
+
+    def _resolve_test(self, test: TestMetadata) -> type:
+        """Retorna a classe de teste, importando o módulo só uma vez."""
+        test_class_name = test.test_class_name
+
+        with self._module_cache_lock:
+            entry = self._module_cache.get(test.module)
+        if entry is None:
+            # Import fora do lock: importlib já serializa imports do mesmo módulo
+            module = importlib.import_module(test.module)
+            with self._module_cache_lock:
+                entry = self._module_cache.setdefault(test.module, (module, {}))
+
+        module, classes = entry
+        test_class = classes.get(test_class_name)
+        if test_class is None:
+            test_class = classes.setdefault(test_class_name, getattr(module, test_class_name))
+        return test_class
+
     def _update_summary(self, result: TestResult) -> None:
         """Atualiza o resumo com o resultado."""
         if result.status == "passed":
             self.summary.passed += 1
         elif result.status == "failed":
             self.summary.failed += 1
+            self.summary.failures.append(result)
         elif result.status == "error":
             self.summary.errors += 1
+            self.summary.failures.append(result)
         elif result.status == "skipped":
             self.summary.skipped += 1
 
     def _print_result(self, result: TestResult) -> None:
         """Imprime o resultado do teste."""
+        sys.stdout.write(self._format_result(result))
+
+    def _format_result(self, result: TestResult) -> str:
+        """Formata o resultado do teste (com quebra de linha final)."""
         if result.status == "passed":
-            print(f"✅ {result.duration:.3f}s")
-        elif result.status == "failed":
-            print(f"❌ {result.duration:.3f}s")
-            if self.config.verbose and result.error:
-                print(f"   {result.error[:100]}")
-        elif result.status == "error":
-            print(f"💥 {result.duration:.3f}s")
+            return f"✅ {result.duration:.3f}s\n"
+        if result.status in ("failed", "error"):
+            icon = "❌" if result.status == "failed" else "💥"
             if self.config.verbose and result.error:
-                print(f"   {result.error[:100]}")
-        else:
-            print(f"⏭️  {result.duration:.3f}s")
+                return f"{icon} {result.duration:.3f}s\n   {result.error[:100]}\n"
+            return f"{icon} {result.duration:.3f}s\n"
+        return f"⏭️  {result.duration:.3f}s\n"
 
     def print_summary(self) -> None:
         """Imprime o resumo da execução."""
@@ -630,13 +816,53 @@ class TestOrchestrator:
 
         if self.summary.failed > 0 or self.summary.errors > 0:
             print("\n❌ TESTES FALHARAM:")
-            for result in self.summary.results:
-                if result.status in ("failed", "error"):
-                    print(f"   - {result.test_id}: {result.error[:60]}...")
+            for result in self.summary.failures:
+                print(f"   - {result.test_id}: {result.error[:60]}...")
 
         print("=" * 60)
 
 
+@functools.lru_cache(maxsize=None)
+def _has_fixtures(test_class: type) -> bool:
+    """Se a classe (ou seu módulo) define fixtures que só a TestSuite executa."""
+    base = unittest.TestCase
+    if (getattr(test_class.setUpClass, '__func__', None) is not base.setUpClass.__func__
+            or getattr(test_class.tearDownClass, '__func__', None) is not base.tearDownClass.__func__):
+        return True
+    module = sys.modules.get(test_class.__module__)
+    return hasattr(module, 'setUpModule') or hasattr(module, 'tearDownModule')
+
+
+def _drain_heap(heap: List[Tuple[Any, ...]]) -> Iterator[TestMetadata]:
+    """Retira os testes do heap em ordem de prioridade, sob demanda."""
+    while heap:
+        yield heapq.heappop(heap)[-1]
+
+
+# Orquestrador do processo worker (use_processes=True)
+_process_orchestrator: Optional[TestOrchestrator] = None
+
+
+def _init_process_worker(sys_path: List[str], modules: List[str],
+                         config: ExecutionConfig) -> None:
+    """Prepara o processo worker: sys.path e configuração do pai, módulos de teste já importados."""
+    global _process_orchestrator
+    sys.path[:] = sys_path
+    # Mesma configuração do pai (retry_flaky, verbose...)
+    _process_orchestrator = TestOrchestrator(config)
+    for module in modules:
+        try:
+            importlib.import_module(module)
+        except Exception:
+            pass  # O erro é reportado no resultado do teste
+
+
+def _execute_chunk_in_process(tests: List[TestMetadata]) -> List[TestResult]:
+    """Executa um lote de testes no processo worker (nível de módulo para ser picklável)."""
+    run = _process_orchestrator._execute_single_test
+    return [run(test) for test in tests]
+
+
 # ============================================================
 # INTEGRAÇÃO CI/CD
 # ============================================================
@@ -694,8 +920,12 @@ class CIOrchestrator:
 
         output_path = Path("test-results.json")
         try:
-            with open(output_path, 'w') as f:
-                json.dump(report, f, indent=2)
+            if orjson is not None:
+                with open(output_path, 'wb') as f:
+                    f.write(orjson.dumps(report, option=orjson.OPT_INDENT_2))
+            else:
+                with open(output_path, 'w') as f:
+                    json.dump(report, f, indent=2)
             print(f"\n📄 Relatório salvo em: {output_path}")
         except OSError as e:
             print(f"⚠️  Erro ao salvar relatório: {e}")
@@ -724,6 +954,11 @@ def main():
         default=4,
         help="Número de workers para execução paralela"
     )
+    parser.add_argument(
+        "--processes",
+        action="store_true",
+        help="Usar processos em vez de threads na execução paralela"
+    )
     parser.add_argument(
         "--fail-fast", "-f",
         action="store_true",
@@ -731,7 +966,7 @@ def main():
     )
     parser.add_argument(
         "--category", "-c",
-        choices=[c.value for c in TestCategory],
+        choices=_CATEGORY_CHOICES,
         action="append",
         help="Executar apenas categorias específicas"
     )
@@ -744,13 +979,12 @@ def main():
     args = parser.parse_args()
 
     # Configurar orquestrador
-    categories = set()
-    if args.category:
-        categories = {TestCategory(c) for c in args.category}
+    categories = {_CATEGORY_BY_VALUE[c] for c in args.category or ()}
 
     config = ExecutionConfig(
         parallel=args.parallel,
         max_workers=args.workers,
+        use_processes=args.processes,
         fail_fast=args.fail_fast,
         categories=categories
     )
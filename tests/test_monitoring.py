@@ -0,0 +1,219 @@
+import unittest
+from unittest.mock import patch
+import gc
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import monitoring
+
+
+class TestAnalyticsConexoes(unittest.TestCase):
+    """Conexões SQLite por thread do TestAnalytics."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.analytics = monitoring.TestAnalytics(os.path.join(tmp.name, "analytics.db"))
+        self.addCleanup(self.analytics.close)
+
+    def test_conexao_fechada_ao_fim_da_thread(self):
+        conexoes = []
+
+        def worker():
+            self.analytics._fetchone("SELECT 1")
+            conexoes.append(self.analytics._local.holder.conn)
+
+        for _ in range(5):
+            thread = threading.Thread(target=worker)
+            thread.start()
+            thread.join()
+        gc.collect()
+
+        # Só a conexão da thread principal (aberta em _init_db) continua viva
+        self.assertEqual(len(self.analytics._holders), 1)
+        for conn in conexoes:
+            with self.assertRaises(monitoring.sqlite3.ProgrammingError):
+                conn.execute("SELECT 1")
+
+
+class TestAnalyticsJanela(unittest.TestCase):
+    """Rollup diário e consultas brutas usam a mesma janela de dias."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.analytics = monitoring.TestAnalytics(os.path.join(tmp.name, "analytics.db"))
+        self.addCleanup(self.analytics.close)
+
+    def test_metricas_e_listas_cobrem_o_mesmo_periodo(self):
+        inicio = monitoring._cutoff(3)
+        self.assertEqual(inicio % 86400, 0)
+
+        execution_id = self.analytics.record_execution(1, {"total": 4})
+        self.analytics.record_test_results(execution_id, [
+            # Fora da janela: último segundo do dia anterior
+            {"test_id": "A.test_x", "status": "failed", "duration": 9.0, "timestamp": inicio - 1},
+            # Dentro: primeiro segundo do dia mais antigo da janela e agora
+            {"test_id": "A.test_x", "status": "failed", "duration": 2.0, "timestamp": inicio},
+            {"test_id": "A.test_x", "status": "passed", "duration": 2.0,
+             "timestamp": int(time.time())},
+        ])
+
+        metrics = self.analytics.get_test_metrics("A.test_x", days=3)
+        slow = self.analytics.get_slow_tests(threshold=1.0, days=3)
+        flaky = self.analytics.get_flaky_tests(threshold=0.2, days=3)
+
+        self.assertEqual(metrics.total_runs, 2)
+        self.assertEqual(metrics.failures, 1)
+        self.assertEqual([m.total_runs for m in slow], [2])
+        self.assertEqual([m.failures for m in flaky], [1])
+        self.assertAlmostEqual(slow[0].avg_duration, metrics.avg_duration)
+        self.assertAlmostEqual(flaky[0].flakiness_score, metrics.flakiness_score)
+
+
+class TestAnalyticsRollup(unittest.TestCase):
+    """Rollup diário (test_stats), flakiness e cache da ordem de execução."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.analytics = monitoring.TestAnalytics(os.path.join(tmp.name, "analytics.db"))
+        self.addCleanup(self.analytics.close)
+        self.agora = int(time.time())
+
+    def _registrar(self, *resultados):
+        execution_id = self.analytics.record_execution(1, {"total": len(resultados)})
+        self.analytics.record_test_results(execution_id, [
+            {"test_id": test_id, "status": status, "duration": duration, "timestamp": self.agora}
+            for test_id, status, duration in resultados
+        ])
+
+    def test_upsert_acumula_lotes(self):
+        self._registrar(("A.test_x", "passed", 1.0), ("A.test_x", "failed", 3.0))
+        self._registrar(("A.test_x", "passed", 0.5))
+
+        linha = self.analytics._fetchone(
+            "SELECT total, failures, sum_dur, sum_dur_sq, min_dur, max_dur, last_ts "
+            "FROM test_stats WHERE test_id = 'A.test_x'"
+        )
+        self.assertEqual(tuple(linha), (3, 1, 4.5, 10.25, 0.5, 3.0, self.agora))
+
+        metrics = self.analytics.get_test_metrics("A.test_x", days=1)
+        self.assertEqual((metrics.total_runs, metrics.failures), (3, 1))
+        self.assertAlmostEqual(metrics.avg_duration, 1.5)
+
+    def test_flakiness_pela_variancia(self):
+        self._registrar(
+            ("A.test_meio", "passed", 0.1), ("A.test_meio", "failed", 0.1),
+            ("A.test_quarto", "failed", 0.1), *[("A.test_quarto", "passed", 0.1)] * 3,
+            ("A.test_sempre", "failed", 0.1), ("A.test_sempre", "error", 0.1),
+        )
+
+        esperado = {"A.test_meio": 1.0, "A.test_quarto": 0.75, "A.test_sempre": 0.0}
+        for test_id, score in esperado.items():
+            with self.subTest(test_id=test_id):
+                self.assertAlmostEqual(
+                    self.analytics.get_test_metrics(test_id, days=1).flakiness_score, score
+                )
+
+        flaky = self.analytics.get_flaky_tests(threshold=0.2, days=1)
+        self.assertEqual([(m.test_id, m.failures) for m in flaky],
+                         [("A.test_meio", 1), ("A.test_quarto", 1)])
+        for m in flaky:
+            self.assertAlmostEqual(m.flakiness_score, esperado[m.test_id])
+
+    def test_ordem_de_execucao_em_cache(self):
+        analyzer = monitoring.PerformanceAnalyzer(self.analytics)
+        self._registrar(("A.test_x", "passed", 2.0), ("A.test_y", "passed", 1.0))
+
+        with patch.object(self.analytics, "_query", wraps=self.analytics._query) as query:
+            ordem = analyzer.optimize_execution_order()
+            self.assertEqual(ordem, ["A.test_x", "A.test_y"])
+            ordem.append("alterada")  # A cópia devolvida não afeta o cache
+            self.assertEqual(analyzer.optimize_execution_order(), ["A.test_x", "A.test_y"])
+            self.assertEqual(query.call_count, 1)
+
+            # Resultado novo muda a geração e invalida o cache
+            self._registrar(("A.test_y", "failed", 1.0))
+            self.assertEqual(analyzer.optimize_execution_order(), ["A.test_y", "A.test_x"])
+            self.assertEqual(query.call_count, 2)
+
+
+# Esquema original (timestamps ISO em TEXT), anterior à migração para epoch
+_ESQUEMA_TEXT = """
+CREATE TABLE executions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    duration REAL NOT NULL,
+    total_tests INTEGER NOT NULL,
+    passed INTEGER NOT NULL,
+    failed INTEGER NOT NULL,
+    errors INTEGER NOT NULL,
+    success_rate REAL NOT NULL,
+    parallel INTEGER NOT NULL,
+    workers INTEGER NOT NULL
+);
+CREATE TABLE test_results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    execution_id INTEGER NOT NULL,
+    test_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    duration REAL NOT NULL,
+    error TEXT,
+    timestamp TEXT NOT NULL,
+    FOREIGN KEY (execution_id) REFERENCES executions (id)
+);
+"""
+
+
+class TestAnalyticsMigracao(unittest.TestCase):
+    """Migração de bancos antigos com timestamp TEXT."""
+
+    def test_migra_timestamps_text_para_epoch(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        db_path = os.path.join(tmp.name, "antigo.db")
+
+        quando = datetime.now().replace(microsecond=0)
+        iso = quando.isoformat()
+        conn = monitoring.sqlite3.connect(db_path)
+        conn.executescript(_ESQUEMA_TEXT)
+        conn.execute(
+            "INSERT INTO executions VALUES (1, ?, 1.5, 2, 1, 1, 0, 50.0, 1, 4)", (iso,)
+        )
+        conn.executemany(
+            "INSERT INTO test_results (execution_id, test_id, status, duration, error, timestamp) "
+            "VALUES (1, ?, ?, ?, NULL, ?)",
+            [("A.test_a", "passed", 0.5, iso), ("A.test_b", "failed", 1.0, iso)],
+        )
+        conn.commit()
+        conn.close()
+
+        analytics = monitoring.TestAnalytics(db_path)
+        self.addCleanup(analytics.close)
+        db = analytics._conn()
+
+        for table in ("executions", "test_results"):
+            tipos = {c["name"]: c["type"] for c in db.execute(f"PRAGMA table_info({table})")}
+            self.assertEqual(tipos["timestamp"], "INTEGER")
+            valores = db.execute(f"SELECT timestamp, typeof(timestamp) FROM {table}").fetchall()
+            self.assertTrue(valores)
+            for valor, tipo in valores:
+                self.assertEqual(tipo, "integer")
+                self.assertEqual(valor, int(quando.timestamp()))
+
+        self.assertEqual(db.execute("PRAGMA foreign_keys").fetchone()[0], 1)
+        self.assertEqual(db.execute("PRAGMA foreign_key_check").fetchall(), [])
+        self.assertEqual(
+            db.execute("SELECT COUNT(*) FROM test_results WHERE execution_id = 1").fetchone()[0], 2
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,362 @@
+import unittest
+from unittest.mock import patch
+import contextlib
+import io
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import orchestrator
+
+_ARQUIVO_TESTE = """
+import unittest
+
+
+class TestExemplo(unittest.TestCase):
+    def test_um(self):
+        pass
+
+    def test_dois(self):
+        pass
+"""
+
+
+class TestDiscoveryCache(unittest.TestCase):
+    """Cache persistente da descoberta de testes."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        (self.dir / "test_exemplo.py").write_text(_ARQUIVO_TESTE, encoding="utf-8")
+        self.cache_path = self.dir / "cache.json"
+
+    def _discover(self):
+        discovery = orchestrator.TestDiscovery([str(self.dir)], cache_path=str(self.cache_path))
+        with patch.object(
+            orchestrator.TestDiscovery, "_analyze_files",
+            wraps=orchestrator.TestDiscovery._analyze_files,
+        ) as analyze:
+            tests = discovery.discover()
+        return tests, analyze.call_count
+
+    def test_cache_reaproveitado(self):
+        tests, analisados = self._discover()
+        self.assertEqual(sorted(tests), ["TestExemplo.test_dois", "TestExemplo.test_um"])
+        self.assertEqual(analisados, 1)
+
+        cache = json.loads(self.cache_path.read_text(encoding="utf-8"))
+        self.assertEqual(cache["header"], orchestrator.TestDiscovery._cache_header())
+
+        tests_cache, analisados = self._discover()
+        self.assertEqual(analisados, 0)
+        self.assertEqual(tests_cache["TestExemplo.test_um"].test_method_name, "test_um")
+
+    def test_cache_de_outra_versao_descartado(self):
+        self._discover()
+        cache = json.loads(self.cache_path.read_text(encoding="utf-8"))
+
+        for header in ({**cache["header"], "version": -1}, {**cache["header"], "python": "2.7"}):
+            with self.subTest(header=header):
+                self.cache_path.write_text(
+                    json.dumps({**cache, "header": header}), encoding="utf-8"
+                )
+                tests, analisados = self._discover()
+                self.assertEqual(analisados, 1)
+                self.assertEqual(len(tests), 2)
+
+        # Formato antigo, sem cabeçalho: {arquivo: entrada}
+        self.cache_path.write_text(json.dumps(cache["files"]), encoding="utf-8")
+        _, analisados = self._discover()
+        self.assertEqual(analisados, 1)
+
+
+_ARQUIVO_BLOCOS = """
+import contextlib
+import unittest
+
+try:
+    import modulo_que_nao_existe
+    HAS_X = True
+except ImportError:
+    HAS_X = False
+
+    class TestSemX(unittest.TestCase):
+        def test_sem_x(self):
+            pass
+
+if not HAS_X:
+    class TestCondicional(unittest.TestCase):
+        def test_condicional(self):
+            pass
+
+with contextlib.suppress(Exception):
+    class TestComWith(unittest.TestCase):
+        def test_com_with(self):
+            pass
+
+
+def fabrica():
+    class TestDentroDeFuncao(unittest.TestCase):
+        def test_ignorado(self):
+            pass
+    return TestDentroDeFuncao
+"""
+
+
+class TestDiscoveryBlocos(unittest.TestCase):
+    """Classes TestCase em blocos de nível de módulo são descobertas."""
+
+    def test_classes_em_if_try_with(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        Path(tmp.name, "test_blocos.py").write_text(_ARQUIVO_BLOCOS, encoding="utf-8")
+
+        discovery = orchestrator.TestDiscovery(
+            [tmp.name], cache_path=os.path.join(tmp.name, "cache.json")
+        )
+        self.assertEqual(sorted(discovery.discover()), [
+            "TestComWith.test_com_with",
+            "TestCondicional.test_condicional",
+            "TestSemX.test_sem_x",
+        ])
+
+
+# Falha só na primeira tentativa; o contador fica em arquivo para valer
+# também quando o teste roda num processo worker
+_MODULO_INSTAVEL = """
+import os
+import unittest
+
+TENTATIVAS = os.path.join(os.path.dirname(__file__), "tentativas")
+
+
+class TestInstavel(unittest.TestCase):
+    def test_instavel(self):
+        with open(TENTATIVAS, "a") as f:
+            f.write("x")
+        with open(TENTATIVAS) as f:
+            self.assertGreater(len(f.read()), 1)
+
+    def test_a(self):
+        pass
+
+    def test_b(self):
+        pass
+
+    def test_c(self):
+        pass
+"""
+
+
+class _ModuloTemporario(unittest.TestCase):
+    """Base: grava um módulo de teste num diretório temporário do sys.path."""
+
+    MODULO = ""
+    FONTE = ""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        (self.dir / f"{self.MODULO}.py").write_text(self.FONTE, encoding="utf-8")
+        sys.path.insert(0, tmp.name)
+        self.addCleanup(sys.path.remove, tmp.name)
+        self.addCleanup(sys.modules.pop, self.MODULO, None)
+
+    def _metadata(self, name, **kwargs):
+        kwargs.setdefault("category", orchestrator.TestCategory.UNIT)
+        kwargs.setdefault("priority", orchestrator.TestPriority.MEDIUM)
+        return orchestrator.TestMetadata(
+            name=name, module=self.MODULO, file_path=str(self.dir / f"{self.MODULO}.py"),
+            line_number=1, **kwargs,
+        )
+
+    def _run(self, tests, **config):
+        orq = orchestrator.TestOrchestrator(orchestrator.ExecutionConfig(**config))
+        orq.tests = {t.name: t for t in tests}
+        saida = io.StringIO()
+        with contextlib.redirect_stdout(saida):
+            summary = orq.run()
+        return summary, saida.getvalue()
+
+
+class TestRetryEmProcessos(_ModuloTemporario):
+    """Workers de processo usam a configuração do orquestrador pai."""
+
+    MODULO = "modulo_instavel_processos"
+    FONTE = _MODULO_INSTAVEL
+
+    def test_retry_flaky_respeitado(self):
+        tests = [self._metadata("TestInstavel.test_instavel", flaky=True)]
+        tests += [self._metadata(f"TestInstavel.test_{n}") for n in "abc"]
+
+        # O padrão (3) faria o teste passar; com 0 a falha tem que aparecer
+        for retry_flaky, status, retries in ((0, "failed", 0), (1, "passed", 1)):
+            with self.subTest(retry_flaky=retry_flaky):
+                (self.dir / "tentativas").unlink(missing_ok=True)
+                summary, _ = self._run(tests, max_workers=2, use_processes=True,
+                                       retry_flaky=retry_flaky)
+
+                resultado = {r.test_id: r for r in summary.results}["TestInstavel.test_instavel"]
+                self.assertEqual((resultado.status, resultado.retries), (status, retries))
+                self.assertEqual(summary.passed, 3 + (status == "passed"))
+
+
+_MODULO_FAIL_FAST = """
+import time
+import unittest
+
+
+class TestLote(unittest.TestCase):
+    def test_falha(self):
+        self.fail("quebrado")
+
+    def test_sequencial(self):
+        pass
+""" + "".join(
+    f"\n    def test_lento_{i}(self):\n        time.sleep(0.01)\n" for i in range(40)
+)
+
+
+class TestFailFastParalelo(_ModuloTemporario):
+    """Fail fast em paralelo: o resumo bate com as linhas impressas."""
+
+    MODULO = "modulo_fail_fast"
+    FONTE = _MODULO_FAIL_FAST
+
+    def test_resumo_igual_as_linhas_impressas(self):
+        tests = [self._metadata("TestLote.test_falha", priority=orchestrator.TestPriority.CRITICAL),
+                 self._metadata("TestLote.test_sequencial", parallel_safe=False)]
+        tests += [self._metadata(f"TestLote.test_lento_{i}") for i in range(40)]
+
+        for use_processes in (False, True):
+            with self.subTest(use_processes=use_processes):
+                summary, saida = self._run(tests, max_workers=2, fail_fast=True,
+                                           use_processes=use_processes)
+
+                impressos = re.findall(r"^\[\d+/\d+\] (\S+)\.\.\. ", saida, re.M)
+                self.assertIn("TestLote.test_falha", impressos)
+                self.assertEqual(sorted(r.test_id for r in summary.results), sorted(impressos))
+                self.assertEqual(summary.total, len(impressos))
+                self.assertEqual(summary.passed + summary.failed + summary.errors, summary.total)
+                self.assertEqual([r.test_id for r in summary.failures], ["TestLote.test_falha"])
+                # Lotes em voo param e os não paralelizáveis não chegam a rodar
+                self.assertLess(summary.total, len(tests))
+                self.assertNotIn("TestLote.test_sequencial", impressos)
+
+
+class TestOrdemDeExecucao(_ModuloTemporario):
+    """Heap de prioridade: LPT em paralelo, mais curtos primeiro em sequência."""
+
+    MODULO = "modulo_ordem"
+    FONTE = _MODULO_INSTAVEL
+
+    def test_ordem_por_prioridade_e_duracao(self):
+        # Estimativa total < _MIN_PARALLEL_ESTIMATE: o modo paralelo roda em
+        # sequência, na ordem em que os testes saem do heap
+        tests = [
+            self._metadata("TestInstavel.test_a", priority=orchestrator.TestPriority.LOW,
+                           estimated_duration=0.001),
+            self._metadata("TestInstavel.test_b", estimated_duration=0.004),
+            self._metadata("TestInstavel.test_c", estimated_duration=0.002),
+            self._metadata("TestInstavel.test_instavel", priority=orchestrator.TestPriority.CRITICAL,
+                           estimated_duration=0.003, flaky=True),
+        ]
+
+        for parallel, esperado in (
+            (True, ["test_instavel", "test_b", "test_c", "test_a"]),
+            (False, ["test_instavel", "test_c", "test_b", "test_a"]),
+        ):
+            with self.subTest(parallel=parallel):
+                summary, _ = self._run(tests, parallel=parallel)
+                self.assertEqual([r.test_id.rpartition(".")[2] for r in summary.results], esperado)
+
+
+class TestRetry(_ModuloTemporario):
+    """Retry de testes instáveis no modo sequencial."""
+
+    MODULO = "modulo_retry"
+    FONTE = _MODULO_INSTAVEL
+
+    def test_retry_so_para_instaveis(self):
+        casos = (
+            ({"flaky": True}, "passed", 1),
+            ({"category": orchestrator.TestCategory.FLAKY}, "passed", 1),
+            ({}, "failed", 0),
+        )
+        for kwargs, status, retries in casos:
+            with self.subTest(**{k: str(v) for k, v in kwargs.items()}):
+                (self.dir / "tentativas").unlink(missing_ok=True)
+                summary, _ = self._run([self._metadata("TestInstavel.test_instavel", **kwargs)],
+                                       parallel=False, retry_flaky=2)
+                resultado, = summary.results
+                self.assertEqual((resultado.status, resultado.retries), (status, retries))
+                # timestamp é relógio de parede (epoch), não o contador monotônico
+                self.assertAlmostEqual(resultado.timestamp, time.time(), delta=60)
+
+
+class TestLotesParalelos(_ModuloTemporario):
+    """Lotes paralelos: cada teste roda e é contado exatamente uma vez."""
+
+    MODULO = "modulo_lotes"
+    FONTE = _MODULO_FAIL_FAST
+
+    def test_resultados_completos(self):
+        tests = [self._metadata("TestLote.test_falha"),
+                 self._metadata("TestLote.test_sequencial", parallel_safe=False)]
+        tests += [self._metadata(f"TestLote.test_lento_{i}") for i in range(40)]
+
+        for use_processes in (False, True):
+            with self.subTest(use_processes=use_processes):
+                summary, saida = self._run(tests, max_workers=4, use_processes=use_processes)
+
+                self.assertEqual(sorted(r.test_id for r in summary.results),
+                                 sorted(t.name for t in tests))
+                self.assertEqual((summary.total, summary.passed, summary.failed), (42, 41, 1))
+                self.assertEqual([r.test_id for r in summary.failures], ["TestLote.test_falha"])
+                self.assertEqual(len(re.findall(r"^\[\d+/42\] ", saida, re.M)), 42)
+                # Não paralelizáveis rodam depois do pool
+                self.assertEqual(summary.results[-1].test_id, "TestLote.test_sequencial")
+
+
+_MODULO_POOL_QUEBRADO = """
+import os
+import unittest
+
+
+class TestPool(unittest.TestCase):
+    def test_morre(self):
+        os._exit(1)
+""" + "".join(f"\n    def test_ok_{i}(self):\n        pass\n" for i in range(20))
+
+
+class TestPoolQuebrado(_ModuloTemporario):
+    """Worker de processo que morre: os testes perdidos viram erro, não somem."""
+
+    MODULO = "modulo_pool_quebrado"
+    FONTE = _MODULO_POOL_QUEBRADO
+
+    def test_lotes_perdidos_contados_como_erro(self):
+        tests = [self._metadata("TestPool.test_morre", priority=orchestrator.TestPriority.CRITICAL)]
+        tests += [self._metadata(f"TestPool.test_ok_{i}") for i in range(20)]
+
+        summary, saida = self._run(tests, max_workers=2, use_processes=True)
+
+        self.assertEqual(sorted(r.test_id for r in summary.results), sorted(t.name for t in tests))
+        self.assertEqual(summary.total, len(tests))
+        self.assertEqual(summary.passed + summary.errors, summary.total)
+        self.assertEqual(len(re.findall(r"^\[\d+/21\] ", saida, re.M)), 21)
+        resultado = {r.test_id: r for r in summary.results}["TestPool.test_morre"]
+        self.assertEqual(resultado.status, "error")
+        self.assertIn("BrokenProcessPool", resultado.error)
+
+
+if __name__ == "__main__":
+    unittest.main()
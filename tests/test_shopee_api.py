@@ -1,5 +1,8 @@
 import unittest
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
+import asyncio
+import hashlib
+import importlib.util
 import json
 import sys
 import os
@@ -7,13 +10,16 @@ import os
 # Add scripts directory to path to import shopee_api
 sys.path.append(os.path.join(os.path.dirname(__file__), "..", "scripts"))
 
-from shopee_api import ShopeeAPI, ShopeeAPIError, get_tipo_loja
+from shopee_api import LinkBatcher, ShopeeAPI, ShopeeAPIError, get_tipo_loja
 
 
-class TestShopeeAPI(unittest.TestCase):
+class TestShopeeAPI(unittest.IsolatedAsyncioTestCase):
     def setUp(self):
         self.api = ShopeeAPI(app_id="test_id", app_secret="test_secret")
 
+    async def asyncTearDown(self):
+        await self.api.aclose()
+
     def test_get_tipo_loja(self):
         """Testa a função get_tipo_loja que extrai a lógica de tipo de loja."""
         self.assertEqual(get_tipo_loja([1]), "Mall")
@@ -23,54 +29,101 @@ class TestShopeeAPI(unittest.TestCase):
         self.assertEqual(get_tipo_loja([4, 2]), "Star+")  # Priority check
         self.assertEqual(get_tipo_loja([]), "")
         self.assertEqual(get_tipo_loja(None), "")  # None handling
+        self.assertEqual(get_tipo_loja((4, 2)), "Star+")  # Tupla (mesma chave do cache)
+        self.assertEqual(get_tipo_loja([4, 2]), "Star+")  # Repetição servida pelo cache
+        self.assertEqual(get_tipo_loja([-1, 10**6, "1"]), "")  # Fora do intervalo: ignorados
+        self.assertEqual(get_tipo_loja([-1, 2]), "Star")
+
+    def test_calculate_signature(self):
+        """A assinatura é SHA256(AppId + Timestamp + Payload + Secret)."""
+        payload = '{"query":"{ ok }","variables":{"keyword":"ação"}}'.encode()
+        expected = hashlib.sha256(
+            b"test_id1700000000" + payload + b"test_secret"
+        ).hexdigest()
+        self.assertEqual(self.api._calculate_signature(1700000000, payload), expected)
+        # O prefixo pré-calculado não pode ser alterado entre chamadas
+        self.assertEqual(self.api._calculate_signature(1700000000, payload), expected)
+        # Timestamp já codificado produz a mesma assinatura
+        self.assertEqual(self.api._calculate_signature(b"1700000000", payload), expected)
+
+    @patch("shopee_api.time.time", return_value=1700000000)
+    @patch("shopee_api.httpx.AsyncClient.post", new_callable=AsyncMock)
+    async def test_request_headers(self, mock_post, _mock_time):
+        mock_response = MagicMock()
+        mock_response.content = b'{"data":{}}'
+        mock_post.return_value = mock_response
+
+        await self.api.request("{ ok }")
+
+        kwargs = mock_post.call_args.kwargs
+        signature = self.api._calculate_signature(1700000000, kwargs["content"])
+        self.assertEqual(
+            kwargs["headers"]["Authorization"],
+            f"SHA256 Credential=test_id, Timestamp=1700000000, Signature={signature}".encode(),
+        )
+        self.assertEqual(kwargs["headers"]["Content-Type"], "application/json")
+        self.assertIn("gzip", kwargs["headers"]["Accept-Encoding"])
+        self.assertNotIn("Authorization", self.api._base_headers)
 
-    @patch("shopee_api.requests.Session.post")
-    def test_buscar_ofertas_lojas_query(self, mock_post):
+    @patch("shopee_api.httpx.AsyncClient.post", new_callable=AsyncMock)
+    async def test_buscar_ofertas_lojas_query(self, mock_post):
         mock_response = MagicMock()
-        mock_response.json.return_value = {"data": {"shopOfferV2": {"nodes": []}}}
+        mock_response.content = b'{"data":{"shopOfferV2":{"nodes":[]}}}'
         mock_response.status_code = 200
         mock_post.return_value = mock_response
 
         # Call with default sort_type
-        self.api.buscar_ofertas_lojas(keyword="test")
+        await self.api.buscar_ofertas_lojas(keyword="test")
 
         # Verify call args
         args, kwargs = mock_post.call_args
-        payload = json.loads(kwargs["data"])
+        payload = json.loads(kwargs["content"])
         self.assertIn("sortType: $sortType", payload["query"])
         self.assertEqual(payload["variables"]["sortType"], 2)
 
         # Call with custom sort_type
-        self.api.buscar_ofertas_lojas(keyword="test", sort_type=1)
+        await self.api.buscar_ofertas_lojas(keyword="test", sort_type=1)
         args, kwargs = mock_post.call_args
-        payload = json.loads(kwargs["data"])
+        payload = json.loads(kwargs["content"])
         self.assertEqual(payload["variables"]["sortType"], 1)
 
-    @patch("shopee_api.requests.Session.post")
-    def test_json_decode_error(self, mock_post):
+    @patch("shopee_api.httpx.AsyncClient.post", new_callable=AsyncMock)
+    async def test_buscar_produtos_filtro_loja(self, mock_post):
+        """O filtro de loja usa a variante da query com $shopId."""
         mock_response = MagicMock()
-        mock_response.json.side_effect = json.JSONDecodeError(
-            "Expecting value", "doc", 0
-        )
+        mock_response.content = b'{"data":{"productOfferV2":{"nodes":[]}}}'
+        mock_response.status_code = 200
+        mock_post.return_value = mock_response
+
+        await self.api.buscar_produtos(shop_id=1404215442)
+        payload = json.loads(mock_post.call_args.kwargs["content"])
+        self.assertIn("shopId: $shopId", payload["query"])
+        self.assertNotIn("productCatId", payload["query"])
+        self.assertEqual(payload["variables"]["shopId"], 1404215442)
+
+    @patch("shopee_api.httpx.AsyncClient.post", new_callable=AsyncMock)
+    async def test_json_decode_error(self, mock_post):
+        mock_response = MagicMock()
+        mock_response.content = b"Invalid JSON"
         mock_response.text = "Invalid JSON"
         mock_response.status_code = 500
         mock_post.return_value = mock_response
 
         with self.assertRaises(ShopeeAPIError) as cm:
-            self.api.request("query")
+            await self.api.request("query")
 
         self.assertIn("Erro ao decodificar JSON", str(cm.exception))
 
-    @patch("shopee_api.ShopeeAPI.request")
-    def test_gerar_link_curto_success(self, mock_request):
+    @patch("shopee_api.ShopeeAPI.request", new_callable=AsyncMock)
+    async def test_gerar_link_curto_success(self, mock_request):
         mock_request.return_value = {
             "generateShortLink": {"shortLink": "http://short.url"}
         }
-        link = self.api.gerar_link_curto("http://original.url")
+        link = await self.api.gerar_link_curto("http://original.url")
         self.assertEqual(link, "http://short.url")
 
-    @patch("shopee_api.ShopeeAPI.request")
-    def test_gerar_link_curto_failure(self, mock_request):
+    @patch("shopee_api.ShopeeAPI.request", new_callable=AsyncMock)
+    async def test_gerar_link_curto_failure(self, mock_request):
         """Testa falhas ao gerar link curto com valores vazios ou None."""
         # Consolidar testes de falha usando subTest
         for short_link_value in ["", None]:
@@ -78,10 +131,180 @@ class TestShopeeAPI(unittest.TestCase):
                 mock_request.return_value = {"generateShortLink": {"shortLink": short_link_value}}
 
                 with self.assertRaises(ShopeeAPIError) as cm:
-                    self.api.gerar_link_curto("http://original.url")
+                    await self.api.gerar_link_curto("http://original.url")
 
                 self.assertIn("Falha ao gerar link curto", str(cm.exception))
 
+    @patch("shopee_api.ShopeeAPI.request", new_callable=AsyncMock)
+    async def test_buscar_produtos_cache(self, mock_request):
+        """Buscas idênticas dentro do TTL reutilizam a resposta."""
+        mock_request.return_value = {
+            "productOfferV2": {"nodes": [{"itemId": 1, "productName": "A"}]}
+        }
+
+        first = await self.api.buscar_produtos(keyword="celular", limit=5)
+        second = await self.api.buscar_produtos(keyword="celular", limit=5)
+        self.assertEqual(first, second)
+        self.assertEqual(mock_request.call_count, 1)
+
+        # Parâmetros diferentes geram nova requisição
+        await self.api.buscar_produtos(keyword="celular", limit=6)
+        self.assertEqual(mock_request.call_count, 2)
+
+        # TTL zero desativa o cache
+        self.api.cache_ttl = 0
+        await self.api.buscar_produtos(keyword="celular", limit=5)
+        self.assertEqual(mock_request.call_count, 3)
+
+    @patch("shopee_api.ShopeeAPI.request", new_callable=AsyncMock)
+    async def test_buscar_produtos_paginado(self, mock_request):
+        """Acima de 500 itens a busca percorre as páginas até o limit."""
+
+        async def fake_request(query, variables):
+            page = variables["page"]
+            nodes = [{"itemId": page * 1000 + i} for i in range(variables["limit"])]
+            return {
+                "productOfferV2": {
+                    "nodes": nodes,
+                    "pageInfo": {"page": page, "hasNextPage": True},
+                }
+            }
+
+        mock_request.side_effect = fake_request
+        produtos = await self.api.buscar_produtos(keyword="celular", limit=700)
+
+        self.assertEqual(len(produtos), 700)
+        self.assertEqual(produtos[500]["itemId"], 2000)
+        pages = [c.args[1]["page"] for c in mock_request.call_args_list]
+        self.assertEqual(pages, [1, 2])
+        self.assertTrue(all(c.args[1]["limit"] == 500 for c in mock_request.call_args_list))
+
+        with self.assertRaises(ValueError):
+            await self.api.buscar_produtos(keyword="celular", limit=2001)
+
+    @patch("shopee_api.ShopeeAPI.request", new_callable=AsyncMock)
+    async def test_gerar_link_curto_cache(self, mock_request):
+        mock_request.return_value = {
+            "generateShortLink": {"shortLink": "http://short.url"}
+        }
+        await self.api.gerar_link_curto("http://original.url", ["a"])
+        link = await self.api.gerar_link_curto("http://original.url", ["a"])
+        self.assertEqual(link, "http://short.url")
+        self.assertEqual(mock_request.call_count, 1)
+
+        await self.api.gerar_link_curto("http://original.url", ["b"])
+        self.assertEqual(mock_request.call_count, 2)
+
+    @patch("shopee_api.ShopeeAPI.request", new_callable=AsyncMock)
+    async def test_gerar_links_curtos(self, mock_request):
+        """Várias URLs viram uma mutation com aliases, na ordem pedida."""
+        mock_request.return_value = {
+            "l0": {"shortLink": "http://s/a"},
+            "l1": {"shortLink": "http://s/b"},
+        }
+        links = await self.api.gerar_links_curtos(
+            ["http://a.url", "http://b.url", "http://a.url"]
+        )
+        self.assertEqual(links, ["http://s/a", "http://s/b", "http://s/a"])
+
+        query, variables = mock_request.call_args.args
+        self.assertIn("l1: generateShortLink(input: $i1)", query)
+        self.assertEqual(variables["i1"]["originUrl"], "http://b.url")
+        self.assertNotIn("i2", variables)  # URLs repetidas vão uma vez só
+
+    @patch("shopee_api.ShopeeAPI.request", new_callable=AsyncMock)
+    async def test_link_batcher_agrupa_chamadas(self, mock_request):
+        mock_request.return_value = {
+            "l0": {"shortLink": "http://s/a"},
+            "l1": {"shortLink": "http://s/b"},
+        }
+        batcher = LinkBatcher(self.api, max_wait_ms=5)
+        try:
+            links = await asyncio.gather(
+                batcher.submit("http://a.url"), batcher.submit("http://b.url")
+            )
+        finally:
+            await batcher.aclose()
+
+        self.assertEqual(links, ["http://s/a", "http://s/b"])
+        self.assertEqual(mock_request.call_count, 1)
+
+    @patch("shopee_api.ShopeeAPI.request", new_callable=AsyncMock)
+    async def test_link_batcher_falha_isolada(self, mock_request):
+        """Se o lote falha por um item, cada URL é tentada sozinha."""
+
+        async def fake_request(query, variables):
+            if "GenerateShortLinks" in query:
+                raise ShopeeAPIError("Erro 11001: URL inválida", code=11001)
+            if variables["input"]["originUrl"] == "http://ruim.url":
+                raise ShopeeAPIError("Erro 11001: URL inválida", code=11001)
+            return {"generateShortLink": {"shortLink": "http://s/ok"}}
+
+        mock_request.side_effect = fake_request
+        batcher = LinkBatcher(self.api, max_wait_ms=5)
+        try:
+            ok, ruim = await asyncio.gather(
+                batcher.submit("http://ok.url"),
+                batcher.submit("http://ruim.url"),
+                return_exceptions=True,
+            )
+        finally:
+            await batcher.aclose()
+
+        self.assertEqual(ok, "http://s/ok")
+        self.assertIsInstance(ruim, ShopeeAPIError)
+
+    @patch("shopee_api.ShopeeAPI.request", new_callable=AsyncMock)
+    async def test_link_batcher_limite_propagado(self, mock_request):
+        """Limite de requisições no lote vai para todos, sem chamadas por URL."""
+        mock_request.side_effect = ShopeeAPIError("Erro 10030: Rate limit", code=10030)
+        batcher = LinkBatcher(self.api, max_wait_ms=5)
+        try:
+            resultados = await asyncio.gather(
+                batcher.submit("http://a.url"),
+                batcher.submit("http://b.url"),
+                return_exceptions=True,
+            )
+        finally:
+            await batcher.aclose()
+
+        for resultado in resultados:
+            self.assertIsInstance(resultado, ShopeeAPIError)
+            self.assertEqual(resultado.code, 10030)
+        self.assertEqual(mock_request.call_count, 1)
+
+
+@unittest.skipUnless(importlib.util.find_spec("mcp"), "pacote mcp não instalado")
+class TestMcpServer(unittest.IsolatedAsyncioTestCase):
+    """Validação dos argumentos das ferramentas do servidor MCP."""
+
+    def setUp(self):
+        sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+        self.addCleanup(sys.path.pop, 0)
+        import mcp_server
+
+        self.mcp_server = mcp_server
+        self.api = MagicMock()
+        self.api.buscar_produtos = AsyncMock(
+            return_value=[{"productName": "P", "price": "1", "offerLink": "http://l"}]
+        )
+
+    async def test_limit_invalido(self):
+        for limit in ["abc", 0, 501, 2.5, [10]]:
+            with self.subTest(limit=limit):
+                with self.assertRaises(ValueError):
+                    await self.mcp_server._handle_buscar_produtos(
+                        self.api, {"keyword": "x", "limit": limit}
+                    )
+        self.api.buscar_produtos.assert_not_called()
+
+    async def test_limit_limitado_na_resposta(self):
+        resposta = await self.mcp_server._handle_buscar_produtos_loja(
+            self.api, {"shop_id": 1, "limit": "100"}
+        )
+        self.assertEqual(self.api.buscar_produtos.call_args.kwargs["limit"], 20)
+        self.assertIn("no máximo 20", resposta[0].text)
+
 
 if __name__ == "__main__":
     unittest.main()